@@ -0,0 +1,49 @@
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException
+
+from app.services import poll_deletion, recount, utils, vote_queue, voter_filter
+from app.services.results_stream import broadcaster
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def get_cache_stats() -> dict[str, Any]:
+    if utils.poll_cache is None or utils.poll_json_cache is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        **utils.poll_cache.stats(),
+        "json": utils.poll_json_cache.stats(),
+    }
+
+
+@router.get("/vote-queue")
+async def get_vote_queue_stats() -> dict[str, Any]:
+    stats = await vote_queue.get_queue_stats()
+    return {"enabled": utils.settings.VOTE_QUEUE_ENABLED, **stats.model_dump()}
+
+
+@router.get("/results-streams")
+async def get_results_stream_stats() -> dict[str, Any]:
+    return broadcaster.stats()
+
+
+@router.get("/voter-filter")
+async def get_voter_filter_stats() -> dict[str, Any]:
+    return voter_filter.stats()
+
+
+@router.get("/deletions")
+async def get_pending_deletions() -> list[poll_deletion.DeletionProgress]:
+    return await poll_deletion.get_pending_deletions()
+
+
+@router.post("/polls/{poll_id}/recount")
+async def recount_votes(poll_id: UUID, repair: bool = False) -> recount.Recount:
+    poll = await utils.get_poll(poll_id)
+    if poll is None or utils.get_archived_poll(poll_id) is not None:
+        raise HTTPException(status_code=404, detail="No votes in Redis for that poll")
+    return await recount.recount_poll(poll, repair)
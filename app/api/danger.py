@@ -1,17 +1,22 @@
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 
-from app.services import utils
+from app.services import poll_deletion, utils
 
 router = APIRouter()
 
 
 @router.delete("/{poll_id}")
-def delete_poll(poll_id: UUID) -> dict[str, str]:
-    if not utils.get_poll(poll_id):
+async def delete_poll(
+    poll_id: UUID, background_tasks: BackgroundTasks
+) -> dict[str, str]:
+    if not await utils.get_poll(poll_id):
         raise HTTPException(status_code=404, detail="A poll by that id does not exist")
 
-    utils.delete_poll(poll_id)
+    # The poll is gone from every read now; a large vote hash is reclaimed
+    # in batches after the response is sent
+    if await utils.delete_poll(poll_id):
+        background_tasks.add_task(poll_deletion.purge_votes_in_background, poll_id)
 
     return {"message": "The Poll was deleted successfully"}
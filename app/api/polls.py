@@ -1,32 +1,48 @@
+import asyncio
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
 from enum import Enum
-from typing import Any
+from typing import Annotated, Any
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
 from app.models.Polls import Poll, PollCreate
 from app.models.Results import PollResults
-from app.services import utils
+from app.services import http_cache, utils, vote_export
+from app.services.results_stream import broadcaster
+from app.services.timeline import Resolution, Timeline, step_seconds
 
 router = APIRouter()
 
 
 # @app.post("/polls/create")
 @router.post("/create")
-def create_poll(poll: PollCreate) -> dict[str, Any]:
+async def create_poll(poll: PollCreate) -> dict[str, Any]:
     new_poll = poll.create_poll()
-    utils.save_poll(new_poll)
+    await utils.save_poll(new_poll)
     return {"detail": "Poll sucesss created", "poll_id": new_poll.id, "poll": new_poll}
 
 
 # @app.get("/polls/{poll_id}", response_model=Poll)
-@router.get("/{poll_id}")
-def get_poll(poll_id: UUID) -> Poll:
-    poll = utils.get_poll(poll_id)
-    if not poll:
+@router.get("/{poll_id}", response_model=Poll)
+async def get_poll(poll_id: UUID, request: Request) -> Response:
+    # Sent as-is, skipping the response model validation and serialization
+    found = await utils.get_poll_with_json(poll_id)
+    if found is None:
         raise HTTPException(status_code=400, detail="A poll id not correct")
-    return poll
+    poll, poll_json = found
+    final = http_cache.final_since(poll, utils.settings)
+    return http_cache.cached_response(
+        request,
+        poll_json,
+        http_cache.poll_etag(poll_json),
+        last_modified=poll.created_at,
+        max_age=utils.settings.CLOSED_POLL_MAX_AGE_SECONDS if final else None,
+    )
 
 
 class PollStatus(Enum):
@@ -38,28 +54,211 @@ class PollStatus(Enum):
 class PollsListResponse(BaseModel):
     count: int
     polls: list[Poll]
+    next_cursor: str | None = None
 
 
-@router.get("/")
-def get_polls(status: PollStatus = PollStatus.ACTIVE) -> PollsListResponse:
-    polls = utils.get_all_polls()
+class PollsCursor(utils.PageCursor):
+    """Opaque cursor handed to clients, bound to the status it was issued for"""
+
+    status: PollStatus
+
+    def encode(self) -> str:
+        return urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str, status: PollStatus) -> "PollsCursor":
+        try:
+            decoded = cls.model_validate_json(urlsafe_b64decode(cursor.encode()))
+        except (ValueError, ValidationError):
+            raise HTTPException(status_code=400, detail="Invalid cursor") from None
+        if decoded.status != status:
+            raise HTTPException(
+                status_code=400, detail="The cursor belongs to another status"
+            )
+        return decoded
 
-    if not polls:
-        raise HTTPException(status_code=404, detail="No polls were found")
+
+@router.get("/")
+async def get_polls(
+    status: PollStatus = PollStatus.ACTIVE,
+    limit: Annotated[int, Query(ge=1, le=100)] = 50,
+    cursor: str | None = None,
+) -> PollsListResponse:
+    after = PollsCursor.decode(cursor, status) if cursor else None
 
     if status == PollStatus.ACTIVE:
-        filtered_polls = [poll for poll in polls if poll.is_active()]
+        polls, next_page = await utils.get_active_polls(limit, after)
     elif status == PollStatus.EXPIRED:
-        filtered_polls = [poll for poll in polls if not poll.is_active()]
+        polls, next_page = await utils.get_expired_polls(limit, after)
     else:  # PollStatus.ALL
-        filtered_polls = polls
+        polls, next_page = await utils.get_all_polls(limit, after)
+
+    if not polls and after is None and not await utils.count_polls():
+        raise HTTPException(status_code=404, detail="No polls were found")
 
-    return PollsListResponse(count=len(filtered_polls), polls=filtered_polls)
+    next_cursor = None
+    if next_page is not None:
+        next_cursor = PollsCursor(**next_page.model_dump(), status=status).encode()
 
+    return PollsListResponse(count=len(polls), polls=polls, next_cursor=next_cursor)
 
-@router.get("/{poll_id}/results")
-def get_results(poll_id: UUID) -> PollResults | None:
+
+@router.get("/{poll_id}/results", response_model=PollResults | None)
+async def get_results(poll_id: UUID, request: Request) -> Response:
     # results = utils.get_vote_count(poll_id)
     # return {"results": results}
 
-    return utils.get_poll_results(poll_id)
+    poll, results_json = await asyncio.gather(
+        utils.get_poll(poll_id), utils.get_poll_results_json(poll_id)
+    )
+    if poll is None or results_json is None:
+        return JSONResponse(content=None)
+    final = http_cache.final_since(poll, utils.settings)
+    return http_cache.cached_response(
+        request,
+        results_json,
+        http_cache.results_etag(results_json),
+        last_modified=final,
+        max_age=utils.settings.CLOSED_POLL_MAX_AGE_SECONDS if final else None,
+    )
+
+
+MAX_BATCH_RESULTS = 100
+
+
+class BatchResultsRequest(BaseModel):
+    poll_ids: list[UUID] = Field(min_length=1, max_length=MAX_BATCH_RESULTS)
+
+
+class BatchResultsResponse(BaseModel):
+    results: list[PollResults]
+    missing: list[UUID]
+
+
+@router.post("/results", response_model=BatchResultsResponse)
+async def get_many_results(request: BatchResultsRequest) -> Response:
+    """
+    Results of up to 100 polls in one request, in the order asked for.
+    Unknown ids are listed under `missing` instead of failing the request.
+    """
+    poll_ids = list(dict.fromkeys(request.poll_ids))
+    found = await utils.get_many_poll_results_json(poll_ids)
+
+    # The stored documents already are PollResults JSON, splice them in as-is
+    results = ",".join(found[pid] for pid in poll_ids if pid in found)
+    missing = ",".join(f'"{pid}"' for pid in poll_ids if pid not in found)
+    return Response(
+        content=f'{{"results":[{results}],"missing":[{missing}]}}',
+        media_type="application/json",
+    )
+
+
+MAX_TIMELINE_BUCKETS = 1440
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+@router.get("/{poll_id}/timeline")
+async def get_timeline(
+    poll_id: UUID,
+    resolution: Resolution = "minute",
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Timeline:
+    """
+    Votes per choice in every minute (or hour) from start to end, empty
+    buckets included. Defaults to the last MAX_TIMELINE_BUCKETS buckets up
+    to now; times without an offset are UTC.
+    """
+    if utils.vote_timeline is None:
+        raise HTTPException(status_code=404, detail="Vote timelines are disabled")
+    poll = await utils.get_poll(poll_id)
+    if poll is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    step = step_seconds(resolution)
+    end = _as_utc(end) if end else datetime.now(UTC)
+    start = (
+        _as_utc(start)
+        if start
+        else end - timedelta(seconds=step * (MAX_TIMELINE_BUCKETS - 1))
+    )
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if int(end.timestamp()) // step - int(start.timestamp()) // step >= (
+        MAX_TIMELINE_BUCKETS
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_TIMELINE_BUCKETS} buckets, use a coarser resolution",
+        )
+
+    return await utils.vote_timeline.get(
+        utils.get_redis(), poll, resolution, start, end
+    )
+
+
+@router.get("/{poll_id}/votes/export")
+async def export_votes(
+    poll_id: UUID,
+    format: vote_export.ExportFormat = vote_export.ExportFormat.NDJSON,  # noqa: A002
+    cursor: str | None = None,
+) -> StreamingResponse:
+    """
+    Every vote of the poll, streamed as NDJSON or CSV in constant memory.
+    The last row of each batch has the cursor to resume after it (see
+    app.services.vote_export).
+    """
+    poll = await utils.get_poll(poll_id)
+    if poll is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if cursor is not None:
+        try:
+            vote_export.check_cursor(poll_id, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+    media_type = (
+        "text/csv" if format == vote_export.ExportFormat.CSV else "application/x-ndjson"
+    )
+    return StreamingResponse(
+        vote_export.export_votes(poll, format, cursor or ""),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="votes-{poll_id}.{format.value}"'
+            )
+        },
+    )
+
+
+@router.get("/{poll_id}/results/stream")
+async def stream_results(poll_id: UUID) -> StreamingResponse:
+    """
+    Server-Sent Events: a `results` event with the PollResults JSON now and
+    on every change, comment heartbeats while nothing changes, and a final
+    `deleted` event if the poll is deleted.
+    """
+    if await utils.get_poll(poll_id) is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    async def events() -> AsyncIterator[str]:
+        updates = broadcaster.subscribe(
+            poll_id, heartbeat=utils.settings.RESULTS_STREAM_HEARTBEAT_SECONDS
+        )
+        async for results in updates:
+            yield (
+                ": heartbeat\n\n"
+                if results is None
+                else f"event: results\ndata: {results}\n\n"
+            )
+        yield "event: deleted\ndata: null\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,32 +1,60 @@
+import json
+from datetime import datetime
+from enum import Enum
 from typing import Annotated, Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
 
 from app.models.Polls import Poll
 from app.models.Votes import Vote, VoteById, VoteByLabel, Voter
-from app.services import utils
+from app.services import utils, vote_queue, voter_filter
 
 router = APIRouter()
 
 
-def common_validations(poll_id: UUID, vote: VoteById | VoteByLabel) -> Poll:
-    poll = utils.get_poll(poll_id)
-    voter_email = vote.voter.email
+async def common_validations(poll_id: UUID) -> Poll:
+    poll = await utils.get_poll(poll_id)
     if poll is None:
         raise HTTPException(status_code=404, detail="Poll not found")
 
     if not poll.is_active():
         raise HTTPException(status_code=400, detail="The poll has expired")
 
-    if utils.get_vote(poll_id, voter_email):
-        raise HTTPException(status_code=400, detail="Already voted")
+    # "Already voted" is decided atomically by utils.save_vote
     return poll
 
 
+async def commit_vote(poll: Poll, vote_model: Vote, response: Response) -> str:
+    email = vote_model.voter.email
+    if utils.settings.VOTE_QUEUE_ENABLED:
+        # Best effort: a vote that is still queued is only caught by the
+        # worker, which drops the duplicate when it commits the batch
+        if await voter_filter.might_have_voted(
+            poll.id, email
+        ) and await utils.has_voted(poll.id, email):
+            raise HTTPException(status_code=400, detail="Already voted")
+        await vote_queue.enqueue_vote(vote_model)
+        voter_filter.record_voter(poll.id, email)
+        response.status_code = 202
+        return "Vote queued"
+
+    status = await utils.save_vote(poll, vote=vote_model)
+    if status == utils.VoteStatus.POLL_NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if status == utils.VoteStatus.ALREADY_VOTED:
+        raise HTTPException(status_code=400, detail="Already voted")
+    voter_filter.record_voter(poll.id, email)
+    return "Vote recorded"
+
+
 @router.post("/{poll_id}/id")
-def vote_by_id(
-    poll_id: UUID, vote: VoteById, poll: Annotated[Poll, Depends(common_validations)]
+async def vote_by_id(
+    poll_id: UUID,
+    vote: VoteById,
+    poll: Annotated[Poll, Depends(common_validations)],
+    response: Response,
 ) -> dict[str, Any]:
     if vote.choice_id not in [choice.id for choice in poll.options]:
         raise HTTPException(status_code=400, detail="Invalid choice id specified")
@@ -37,14 +65,17 @@ def vote_by_id(
         voter=Voter(**vote.voter.model_dump()),
     )
 
-    utils.save_vote(poll_id, vote=vote_model)
+    message = await commit_vote(poll, vote_model, response)
 
-    return {"message": "Vote recorded", "vote": vote_model}
+    return {"message": message, "vote": vote_model}
 
 
 @router.post("/{poll_id}/label")
-def vote_by_label(
-    poll_id: UUID, vote: VoteByLabel, poll: Poll = Depends(common_validations)
+async def vote_by_label(
+    poll_id: UUID,
+    vote: VoteByLabel,
+    response: Response,
+    poll: Poll = Depends(common_validations),
 ) -> dict[str, Any]:
     # choice_id = utils.get_choice_id_by_label(poll_id, vote.choice_label)
     choice_id = utils.get_choice_id_by_label_given(poll, vote.choice_label)
@@ -58,6 +89,146 @@ def vote_by_label(
         voter=Voter(**vote.voter.model_dump()),
     )
 
-    utils.save_vote(poll_id, vote=vote_model)
-
-    return {"message": "Vote recorded", "vote": vote_model}
+    message = await commit_vote(poll, vote_model, response)
+
+    return {"message": message, "vote": vote_model}
+
+
+class BulkVoteStatus(Enum):
+    ACCEPTED = "accepted"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+
+
+class BulkVoteItemResult(BaseModel):
+    index: int
+    status: BulkVoteStatus
+    detail: str | None = None
+
+
+class BulkVoteResponse(BaseModel):
+    accepted: int
+    duplicate: int
+    invalid: int
+    items: list[BulkVoteItemResult]
+
+
+MAX_BULK_VOTES = 10_000
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+async def read_bulk_items(request: Request) -> list[VoteById | VoteByLabel | str]:
+    """
+    Parse a JSON array or an NDJSON body into votes. Items that fail
+    validation are kept as their error message so they can be reported
+    by position.
+    """
+    items: list[VoteById | VoteByLabel | str] = []
+    if request.headers.get("content-type", "").startswith(NDJSON_TYPES):
+        buffer = b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            items += [_parse_item(line) for line in lines if line.strip()]
+            if len(items) > MAX_BULK_VOTES:
+                break
+        if buffer.strip():
+            items.append(_parse_item(buffer))
+    else:
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body") from None
+        if not isinstance(body, list):
+            raise HTTPException(
+                status_code=400, detail="Expected a JSON array of votes"
+            )
+        items = [_parse_item(raw) for raw in body[: MAX_BULK_VOTES + 1]]
+
+    if len(items) > MAX_BULK_VOTES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BULK_VOTES} votes per request"
+        )
+    return items
+
+
+def _parse_item(raw: Any) -> VoteById | VoteByLabel | str:
+    if isinstance(raw, bytes):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return "Invalid JSON"
+    if not isinstance(raw, dict):
+        return "Expected a vote object"
+
+    model = VoteById if "choice_id" in raw else VoteByLabel
+    try:
+        return model.model_validate(raw)
+    except ValidationError as e:
+        error = e.errors()[0]
+        return f"{' -> '.join(map(str, error['loc']))}: {error['msg']}"
+
+
+@router.post("/{poll_id}/bulk")
+async def vote_bulk(
+    request: Request, poll: Annotated[Poll, Depends(common_validations)]
+) -> BulkVoteResponse:
+    """
+    Replay many votes for one poll, sent as a JSON array or as NDJSON
+    (Content-Type: application/x-ndjson) of VoteById / VoteByLabel items.
+    """
+    items = await read_bulk_items(request)
+
+    results = [
+        BulkVoteItemResult(index=i, status=BulkVoteStatus.ACCEPTED)
+        for i in range(len(items))
+    ]
+    valid_choice_ids = {choice.id for choice in poll.options}
+    seen_emails: set[str] = set()
+    pending: list[tuple[int, Vote]] = []
+
+    for index, item in enumerate(items):
+        result = results[index]
+        if isinstance(item, str):
+            result.status, result.detail = BulkVoteStatus.INVALID, item
+            continue
+
+        if isinstance(item, VoteById):
+            choice_id = item.choice_id if item.choice_id in valid_choice_ids else None
+        else:
+            choice_id = utils.get_choice_id_by_label_given(poll, item.choice_label)
+        if choice_id is None:
+            result.status, result.detail = BulkVoteStatus.INVALID, "Invalid choice"
+            continue
+
+        if item.voter.email in seen_emails:
+            result.status, result.detail = (
+                BulkVoteStatus.DUPLICATE,
+                "Duplicate in batch",
+            )
+            continue
+        seen_emails.add(item.voter.email)
+
+        # The email was validated when the item was parsed, validating it
+        # again for Voter costs more than the whole Redis write
+        voter = Voter.model_construct(email=item.voter.email, voted_at=datetime.now())
+        vote_model = Vote.model_construct(
+            poll_id=poll.id, choice_id=choice_id, voter=voter
+        )
+        pending.append((index, vote_model))
+
+    statuses = await utils.save_votes(poll, [vote for _, vote in pending])
+    if utils.VoteStatus.POLL_NOT_FOUND in statuses:
+        # Deleted meanwhile: the votes committed before that went with it
+        raise HTTPException(status_code=404, detail="Poll not found")
+    for (index, vote), status in zip(pending, statuses, strict=True):
+        voter_filter.record_voter(poll.id, vote.voter.email)
+        if status == utils.VoteStatus.ALREADY_VOTED:
+            results[index].status = BulkVoteStatus.DUPLICATE
+            results[index].detail = "Already voted"
+
+    return BulkVoteResponse(
+        accepted=sum(r.status == BulkVoteStatus.ACCEPTED for r in results),
+        duplicate=sum(r.status == BulkVoteStatus.DUPLICATE for r in results),
+        invalid=sum(r.status == BulkVoteStatus.INVALID for r in results),
+        items=results,
+    )
@@ -0,0 +1,21 @@
+"""
+Moves polls that expired more than POLL_ARCHIVE_GRACE_SECONDS ago out of
+Redis into the archive at POLL_ARCHIVE_DIR (see app.services.poll_lifecycle).
+Run it periodically, e.g. from cron.
+
+Safe to run more than once and while the API is serving.
+
+Usage:
+    python -m app.commands.archive_expired_polls
+"""
+
+import asyncio
+
+from app.services import poll_lifecycle
+
+if __name__ == "__main__":
+    outcome = asyncio.run(poll_lifecycle.archive_expired_polls())
+    print(  # noqa: T201
+        f"Archived {outcome.archived} polls ({outcome.votes} votes), "
+        f"{outcome.retried} left for the next run, {outcome.gone} deleted meanwhile"
+    )
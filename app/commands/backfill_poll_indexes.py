@@ -0,0 +1,39 @@
+"""
+One-off backfill of the poll listing indexes (polls:created, polls:expires)
+and of the archiving queue (polls:to_archive) for polls saved before
+save_poll started maintaining them.
+
+Walks the keyspace with SCAN instead of KEYS so Redis keeps serving other
+clients while it runs. Safe to run more than once.
+
+Usage:
+    python -m app.commands.backfill_poll_indexes
+"""
+
+import asyncio
+
+from app.services import utils
+from app.services.poll_codec import decode_poll
+
+BATCH_SIZE = 500
+
+
+async def backfill() -> int:
+    indexed = 0
+    cursor = 0
+    while True:
+        cursor, keys = await utils.get_redis().scan(
+            cursor, match="poll:*", count=BATCH_SIZE
+        )
+        if keys:
+            poll_jsons = await utils.get_redis().mget(*keys)
+            polls = [decode_poll(pj) for pj in poll_jsons if pj]
+            await utils.index_polls(polls)
+            indexed += len(polls)
+        if cursor == 0:
+            return indexed
+
+
+if __name__ == "__main__":
+    total = asyncio.run(backfill())
+    print(f"Indexed {total} polls")  # noqa: T201
@@ -0,0 +1,40 @@
+"""
+Rewrites every poll:{poll_id} record still in the legacy format (see
+app.services.poll_codec) in the current storage format. Reads already
+migrate records lazily; this finishes the job for polls nobody reads.
+
+Walks the keyspace with SCAN, like backfill_poll_indexes. Safe to run more
+than once and while the API is serving.
+
+Usage:
+    python -m app.commands.migrate_poll_storage
+"""
+
+import asyncio
+
+from app.services import utils
+from app.services.poll_codec import decode_poll, is_current
+
+BATCH_SIZE = 500
+
+
+async def migrate() -> tuple[int, int]:
+    seen = migrated = 0
+    cursor = 0
+    while True:
+        cursor, keys = await utils.get_redis().scan(
+            cursor, match="poll:*", count=BATCH_SIZE
+        )
+        if keys:
+            poll_jsons = await utils.get_redis().mget(*keys)
+            legacy = [decode_poll(pj) for pj in poll_jsons if pj and not is_current(pj)]
+            await utils.migrate_stored_polls(legacy)
+            seen += sum(1 for pj in poll_jsons if pj)
+            migrated += len(legacy)
+        if cursor == 0:
+            return seen, migrated
+
+
+if __name__ == "__main__":
+    seen, migrated = asyncio.run(migrate())
+    print(f"Migrated {migrated} of {seen} polls")  # noqa: T201
@@ -0,0 +1,85 @@
+"""
+Rewrites the stored votes of every poll in one encoding (see
+app.services.vote_codec). Run it after switching VOTE_ENCODING so older
+votes shrink too; reads understand both encodings meanwhile.
+
+Votes are never modified once cast, so rewriting a value while the API keeps
+taking votes is safe. Each batch is written by REWRITE_VOTES, which stops at
+a poll deleted or archived mid-way instead of bringing its votes back. Safe
+to run more than once.
+
+Usage:
+    python -m app.commands.migrate_vote_encoding --to compact
+"""
+
+import argparse
+import asyncio
+from typing import cast
+from uuid import UUID
+
+from app.services import utils
+from app.services.scripts import REWRITE_VOTES
+from app.services.vote_codec import VoteEncoding, decode_vote, encode_vote
+
+BATCH_SIZE = 500
+
+
+async def migrate_poll(poll_id: UUID, encoding: VoteEncoding) -> int:
+    poll = await utils.get_poll(poll_id)
+    if poll is None:
+        return 0
+
+    rewritten = 0
+    cursor = 0
+    while True:
+        cursor, stored_votes = await utils.get_redis().hscan(
+            f"votes:{poll_id}", cursor, count=BATCH_SIZE
+        )
+        updates = {}
+        for email, stored in stored_votes.items():
+            vote = decode_vote(poll, email, stored)
+            if (
+                vote is not None
+                and (new := encode_vote(poll, vote, encoding)) != stored
+            ):
+                updates[email] = new
+        if updates:
+            written = int(
+                await REWRITE_VOTES(
+                    utils.get_redis(),
+                    keys=[f"poll:{poll_id}", f"votes:{poll_id}"],
+                    args=[part for pair in updates.items() for part in pair],
+                )
+            )
+            if written < 0:
+                # Deleted or archived since
+                return rewritten
+            rewritten += written
+        if cursor == 0:
+            return rewritten
+
+
+async def migrate(encoding: VoteEncoding) -> tuple[int, int]:
+    polls = rewritten = 0
+    start = 0
+    while True:
+        poll_ids = cast(
+            list[str],
+            await utils.get_redis().zrange(
+                utils.POLLS_BY_CREATED, start, start + BATCH_SIZE - 1
+            ),
+        )
+        for poll_id in poll_ids:
+            rewritten += await migrate_poll(UUID(poll_id), encoding)
+        polls += len(poll_ids)
+        if len(poll_ids) < BATCH_SIZE:
+            return polls, rewritten
+        start += BATCH_SIZE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--to", choices=["json", "compact"], default="compact")
+    args = parser.parse_args()
+    polls, rewritten = asyncio.run(migrate(args.to))
+    print(f"Rewrote {rewritten} votes across {polls} polls")  # noqa: T201
@@ -0,0 +1,32 @@
+"""
+Reclaims the votes of deleted polls whose background cleanup did not finish
+(the process crashed or was frozen mid-way), see app.services.poll_deletion.
+Each poll resumes from its saved HSCAN cursor.
+
+Safe to run more than once and while the API is serving.
+
+Usage:
+    python -m app.commands.purge_deleted_polls
+"""
+
+import asyncio
+
+from app.services import poll_deletion
+
+
+async def purge() -> int:
+    purged = 0
+    while pending := await poll_deletion.get_pending_deletions():
+        for deletion in pending:
+            batches = await poll_deletion.purge_votes(deletion.poll_id)
+            print(  # noqa: T201
+                f"Poll {deletion.poll_id}: {deletion.remaining} of "
+                f"{deletion.total} votes left, reclaimed in {batches} batches"
+            )
+            purged += 1
+    return purged
+
+
+if __name__ == "__main__":
+    purged = asyncio.run(purge())
+    print(f"Purged the votes of {purged} deleted polls")  # noqa: T201
@@ -0,0 +1,65 @@
+"""
+Recounts the vote counters of polls from their votes and reports the polls
+whose counters drifted (see app.services.recount). With --repair the
+counters of drifted polls are replaced by the recount, atomically and only
+if no vote was cast meanwhile.
+
+Polls are recounted by a pool of --workers concurrent workers, all polls by
+default. Safe to run while the API is serving.
+
+Usage:
+    python -m app.commands.recount_votes
+    python -m app.commands.recount_votes --repair --workers 16
+    python -m app.commands.recount_votes --repair <poll_id> <poll_id>
+"""
+
+import argparse
+import asyncio
+import time
+from typing import cast
+from uuid import UUID
+
+from app.services import recount, utils
+
+
+async def main(args: argparse.Namespace) -> None:
+    poll_ids = args.poll_ids or [
+        UUID(poll_id)
+        for poll_id in cast(
+            list[str], await utils.get_redis().zrange(utils.POLLS_BY_CREATED, 0, -1)
+        )
+    ]
+
+    started = time.perf_counter()
+    outcome = await recount.recount_polls(poll_ids, args.repair, args.workers)
+    elapsed = time.perf_counter() - started
+    recounts = outcome.recounts
+
+    for result in recounts:
+        if result.drift or result.unknown:
+            print(  # noqa: T201
+                f"Poll {result.poll_id}: drift {result.drift}, "
+                f"{result.unknown} votes for unknown choices"
+                + (", repaired" if result.repaired else "")
+                + (", votes cast meanwhile, run again" if result.changed else "")
+            )
+    votes = sum(result.votes for result in recounts)
+    print(  # noqa: T201
+        f"Recounted {votes} votes of {len(recounts)} polls in {elapsed:.2f} s "
+        f"({votes / elapsed:,.0f} votes/s): "
+        f"{sum(1 for r in recounts if r.drift)} drifted, "
+        f"{sum(1 for r in recounts if r.repaired)} repaired"
+    )
+    if outcome.failed:
+        print(  # noqa: T201
+            f"{len(outcome.failed)} polls failed to recount, see the log: "
+            + " ".join(str(poll_id) for poll_id in outcome.failed)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("poll_ids", nargs="*", type=UUID)
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--workers", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
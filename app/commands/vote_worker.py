@@ -0,0 +1,59 @@
+"""
+Drains the vote queue (see app.services.vote_queue) into Redis. Run one or
+more alongside the API when VOTE_QUEUE_ENABLED is set; each process joins the
+consumer group under its own name, so they share the stream without handing
+out the same entry twice.
+
+Usage:
+    python -m app.commands.vote_worker [--consumer NAME] [--once]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+from app.services import vote_queue
+
+STATS_INTERVAL_SECONDS = 30.0
+
+
+async def run(consumer: str, once: bool) -> None:
+    settings = vote_queue.settings
+    reclaim_every = settings.VOTE_QUEUE_RETRY_IDLE_MS / 1000 / 2
+    await vote_queue.ensure_group()
+
+    last_reclaim = last_stats = 0.0
+    while True:
+        now = time.monotonic()
+        reclaim = now - last_reclaim >= reclaim_every
+        if reclaim:
+            last_reclaim = now
+
+        handled, outcome = await vote_queue.process_batch(consumer, reclaim=reclaim)
+        if handled:
+            print(f"{consumer}: {outcome.model_dump()}")  # noqa: T201
+
+        if once and not handled:
+            return
+        if now - last_stats >= STATS_INTERVAL_SECONDS:
+            last_stats = now
+            stats = await vote_queue.get_queue_stats()
+            print(f"queue: {stats.model_dump()}")  # noqa: T201
+        if not handled:
+            await asyncio.sleep(settings.VOTE_QUEUE_POLL_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--consumer",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="name of this worker in the consumer group",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="exit once the queue is drained"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.consumer, args.once))
@@ -1,10 +1,10 @@
 import logging
+import sys
 from abc import ABC, abstractmethod
 
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from rich.logging import RichHandler
 
 # --- Cấu hình Logging (Nên thực hiện ở cấp ứng dụng) ---
 # Cấu hình logging cơ bản. Trong dự án thực tế, bạn có thể dùng file cấu hình (dictConfig).
@@ -13,11 +13,27 @@ from rich.logging import RichHandler
 #     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 #     handlers=[logging.StreamHandler()],
 # )
+
+
+def _log_handler() -> logging.Handler:
+    # rich chỉ dùng khi log ra terminal: import rich tốn ~50 ms mỗi lần cold
+    # start, còn log trên serverless không phải terminal nên không cần màu
+    if sys.stderr.isatty():
+        from rich.logging import RichHandler
+
+        return RichHandler(rich_tracebacks=True)  # Kích hoạt traceback đẹp
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s")
+    )
+    return handler
+
+
 logging.basicConfig(
     level="INFO",
     format="%(name)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[RichHandler(rich_tracebacks=True)],  # Kích hoạt traceback đẹp
+    handlers=[_log_handler()],
 )
 
 logger = logging.getLogger("rich")
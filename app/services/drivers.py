@@ -0,0 +1,177 @@
+"""
+Storage drivers, chosen by REDIS_DRIVER. The app talks to Redis through the
+upstash_redis command set (execute(), the typed helpers such as get/mget/zadd,
+and pipeline() / multi() batches), whatever carries the commands:
+
+- "rest": the Upstash REST API. Every command or batch is an HTTP request, so
+  the driver shares one httpx pool sized by REDIS_POOL_SIZE and keeps that
+  many connections alive, instead of the client default of 20 kept alive for
+  5 seconds (past that, bursts pay a new TLS handshake per request);
+- "resp": the native Redis protocol for a self-hosted Redis at REDIS_URL,
+  through redis-py's asyncio client and a blocking connection pool
+  (app/services/resp_driver.py).
+
+Both hand back the raw replies of the REST API (strings, integers, lists)
+shaped by upstash_redis' cast_response, and raise UpstashError for errors
+returned by the server, so callers never know which one they run on.
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import Any, Literal
+
+import httpx
+from upstash_redis.asyncio import Redis
+from upstash_redis.asyncio.client import AsyncPipeline
+from upstash_redis.commands import AsyncCommands, AsyncJsonCommands, PipelineCommands
+from upstash_redis.http import AsyncHttpClient, make_headers
+
+from app.services import metrics
+from config import Settings
+
+
+class StoragePipeline(PipelineCommands, ABC):
+    """Commands queued with execute() or the typed helpers, sent by exec()"""
+
+    @abstractmethod
+    def execute(self, command: list[Any]) -> "StoragePipeline": ...
+
+    @abstractmethod
+    async def exec(self) -> list[Any]: ...
+
+
+class StorageDriver(AsyncCommands, ABC):
+    @abstractmethod
+    async def execute(self, command: list[Any]) -> Any: ...
+
+    @abstractmethod
+    def pipeline(self) -> StoragePipeline: ...
+
+    @abstractmethod
+    def multi(self) -> StoragePipeline:
+        """A batch run as one MULTI/EXEC transaction"""
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+def command_label(command: list[Any]) -> str:
+    return str(command[0]).upper()
+
+
+class RestPipeline(AsyncPipeline, StoragePipeline):
+    instrumented = False
+
+    def execute(self, command: list[Any]) -> "RestPipeline":
+        super().execute(command)
+        return self
+
+    async def exec(self) -> list[Any]:
+        if not self.instrumented:
+            return await super().exec()
+        label = "MULTI" if self._url.endswith("/multi-exec") else "PIPELINE"
+        return await metrics.timed(label, self._command_stack, super().exec())
+
+
+class PooledHttpClient(AsyncHttpClient):
+    """
+    upstash_redis' HTTP client on the given httpx client. The parent
+    __init__ is skipped: it builds a default httpx.AsyncClient (40-80 ms,
+    mostly its TLS context) that would only be thrown away.
+    """
+
+    def __init__(
+        self, client: httpx.AsyncClient, sync_token_cb: Callable[[str], None]
+    ) -> None:
+        # AsyncHttpClient's defaults, as Redis() passes them
+        self._encoding = "base64"
+        self._retries = 1
+        self._retry_interval = 3
+        self._sync_token_cb = sync_token_cb
+        self._client = client
+
+
+class RestDriver(Redis, StorageDriver):
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        pool_size: int,
+        pool_timeout: float,
+        keepalive: float,
+        instrumented: bool,
+    ) -> None:
+        # Redis.__init__ with its defaults (upstash-redis 1.4), but the HTTP
+        # client built once, tuned
+        self._url = url
+        self._read_your_writes = True
+        self._sync_token = ""
+        self._allow_telemetry = True
+        self._headers = make_headers(token, "base64", True)
+        self._json = AsyncJsonCommands(self)
+        # Same unbounded request timeout as the client default, but a bounded
+        # wait for a free connection
+        self._http = PooledHttpClient(
+            httpx.AsyncClient(
+                timeout=httpx.Timeout(None, pool=pool_timeout),
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=keepalive,
+                ),
+            ),
+            self._update_sync_token,
+        )
+        self.instrumented = instrumented
+
+    async def execute(self, command: list[Any]) -> Any:
+        if not self.instrumented:
+            return await super().execute(command)
+        return await metrics.timed(
+            command_label(command), [command], super().execute(command)
+        )
+
+    def pipeline(self) -> RestPipeline:
+        return self._pipeline("pipeline")
+
+    def multi(self) -> RestPipeline:
+        return self._pipeline("multi-exec")
+
+    def _pipeline(self, multi_exec: Literal["multi-exec", "pipeline"]) -> RestPipeline:
+        pipeline = RestPipeline(
+            url=self._url,
+            headers=self._headers,
+            http=self._http,
+            multi_exec=multi_exec,
+            set_sync_token_header_fn=self._maybe_set_sync_token_header,
+        )
+        pipeline.instrumented = self.instrumented
+        return pipeline
+
+
+def create_driver(settings: Settings) -> StorageDriver:
+    if settings.REDIS_DRIVER == "resp":
+        if settings.REDIS_URL is None:
+            raise RuntimeError("REDIS_URL must be set to use REDIS_DRIVER=resp")
+        # redis-py takes ~100 ms to import: only when this driver is used
+        from app.services.resp_driver import RespDriver
+
+        return RespDriver.from_url(
+            settings.REDIS_URL,
+            pool_size=settings.REDIS_POOL_SIZE,
+            pool_timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+            instrumented=settings.METRICS_ENABLED,
+        )
+
+    if settings.UPSTASH_REDIS_URL is None or settings.UPSTASH_REDIS_TOKEN is None:
+        raise RuntimeError(
+            "UPSTASH_REDIS_URL and UPSTASH_REDIS_TOKEN must be set in .env or environment"
+        )
+    return RestDriver(
+        settings.UPSTASH_REDIS_URL,
+        settings.UPSTASH_REDIS_TOKEN,
+        pool_size=settings.REDIS_POOL_SIZE,
+        pool_timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+        keepalive=settings.REDIS_KEEPALIVE_SECONDS,
+        instrumented=settings.METRICS_ENABLED,
+    )
@@ -0,0 +1,93 @@
+"""
+HTTP caching of poll reads: validators for conditional GETs (answered with
+304 Not Modified) and Cache-Control.
+
+- A poll never changes once created: its ETag is a digest of the body and
+  its Last-Modified is created_at.
+- The ETag of a poll's results is a digest of the results document too. Its
+  total_votes alone would miss a recount repair (app.services.recount),
+  which can move votes between choices without changing the total.
+- Once a poll is final (closed, and past the grace period of the vote queue
+  when votes may still be waiting in it) nothing about it can change:
+  responses are `immutable` and CDNs and browsers keep them for
+  CLOSED_POLL_MAX_AGE_SECONDS. Until then they are stored but revalidated
+  on every use (`no-cache`).
+"""
+
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+
+from fastapi import Request, Response
+
+from app.models.Polls import Poll
+from config import Settings
+
+
+def _digest(body: str) -> str:
+    return f'"{blake2b(body.encode(), digest_size=8).hexdigest()}"'
+
+
+def poll_etag(poll_json: str) -> str:
+    return _digest(poll_json)
+
+
+def results_etag(results_json: str) -> str:
+    return _digest(results_json)
+
+
+def final_since(poll: Poll, settings: Settings) -> datetime | None:
+    """When the poll's results stopped changing, None while they still can"""
+    if poll.expires_at is None:
+        return None
+    final = poll.expires_at
+    if settings.VOTE_QUEUE_ENABLED:
+        final += timedelta(seconds=settings.POLL_ARCHIVE_GRACE_SECONDS)
+    return final if final <= datetime.now(UTC) else None
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    # HTTP dates have whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def cached_response(
+    request: Request,
+    body: str,
+    etag: str,
+    last_modified: datetime | None,
+    max_age: int | None,
+) -> Response:
+    """
+    The JSON response for body, or a bodyless 304 when the client's copy is
+    current. max_age marks the response immutable, None has it revalidated.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache"
+        if max_age is None
+        else f"public, max-age={max_age}, immutable",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(UTC), usegmt=True
+        )
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,96 @@
+"""
+Request-scoped batching of Redis reads, in the style of DataLoader.
+
+While a request is handled (RedisLoaderMiddleware), utils sends its reads
+through the request's RedisLoader instead of straight to Upstash:
+
+- reads issued before the event loop gets back to the loader, typically from
+  the branches of one asyncio.gather, go out together as one pipeline
+  (a lone read is sent as a plain command);
+- a read repeated within the request is answered from the first one, so it
+  sees the value as of that first read.
+
+Outside a request (workers, commands, background tasks started with a fresh
+context) there is no loader and reads go to Upstash directly.
+"""
+
+import asyncio
+from collections.abc import Awaitable
+from contextvars import ContextVar
+from typing import Any
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.drivers import StorageDriver
+
+Command = tuple[str, ...]
+
+current_loader: ContextVar["RedisLoader | None"] = ContextVar(
+    "current_loader", default=None
+)
+
+
+class RedisLoader:
+    def __init__(self) -> None:
+        self._results: dict[Command, asyncio.Future[Any]] = {}
+        self._queued: list[Command] = []
+        self._flushes: set[asyncio.Task[None]] = set()
+
+    def load(self, client: StorageDriver, command: list[str]) -> Awaitable[Any]:
+        key = tuple(command)
+        future = self._results.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._results[key] = loop.create_future()
+            if not self._queued:
+                # The flush task starts after every task already scheduled
+                # for this loop iteration has had its turn to queue a read
+                flush = loop.create_task(self._flush(client))
+                self._flushes.add(flush)
+                flush.add_done_callback(self._flushes.discard)
+            self._queued.append(key)
+        return future
+
+    async def _flush(self, client: StorageDriver) -> None:
+        batch, self._queued = self._queued, []
+        try:
+            if len(batch) == 1:
+                results = [await client.execute(list(batch[0]))]
+            else:
+                pipeline = client.pipeline()
+                for command in batch:
+                    pipeline.execute(list(command))
+                results = await pipeline.exec()
+        except Exception as e:
+            for command in batch:
+                # Forget the failure so a later read in the request retries
+                self._results.pop(command).set_exception(e)
+            return
+
+        for command, result in zip(batch, results, strict=True):
+            self._results[command].set_result(result)
+
+
+async def read(client: StorageDriver, command: list[str]) -> Any:
+    loader = current_loader.get()
+    if loader is None:
+        return await client.execute(command)
+    return await loader.load(client, command)
+
+
+class RedisLoaderMiddleware:
+    """Give each HTTP request its own RedisLoader"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_loader.set(RedisLoader())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_loader.reset(token)
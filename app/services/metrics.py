@@ -0,0 +1,222 @@
+"""
+In-process Prometheus metrics, rendered on GET /metrics in the text format.
+
+- http_request_duration_seconds{method,route}: latency per route template
+  (/polls/{poll_id}, not the concrete path, to keep the series bounded);
+- http_requests_total{method,route,status};
+- redis_request_duration_seconds{command}: one observation per round trip to
+  Redis, labelled with the command name, or PIPELINE / MULTI for batches;
+- redis_commands_total{command}: every command, including those in batches;
+- redis_errors_total{command}.
+
+Recording is a dict lookup and a bisect per observation, with no locks: all
+of it runs on the event loop thread. Values are per process, as usual for
+Prometheus, which sums across instances at query time.
+"""
+
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Iterator
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Seconds, from a cached read to a slow bulk write over the network
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Labels) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[Labels, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, labels: Labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value!r}"
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int) -> None:
+        # Per-bucket counts, the last one for values above every bound
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.bounds = buckets
+        self._series: dict[Labels, _Series] = {}
+        REGISTRY.append(self)
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(len(self.bounds) + 1)
+        series.buckets[bisect_left(self.bounds, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    def count(self, labels: Labels) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else series.count
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(
+                (*map(repr, self.bounds), "+Inf"), series.buckets, strict=True
+            ):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {series.sum!r}"
+            yield f"{self.name}_count{label_text} {series.count}"
+
+
+REGISTRY: list[Counter | Histogram] = []
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route"),
+)
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code.",
+    ("method", "route", "status"),
+)
+redis_request_duration = Histogram(
+    "redis_request_duration_seconds",
+    "Redis round trip latency by command, PIPELINE or MULTI for batches.",
+    ("command",),
+)
+redis_commands = Counter(
+    "redis_commands_total",
+    "Redis commands sent, including those inside batches.",
+    ("command",),
+)
+redis_errors = Counter(
+    "redis_errors_total",
+    "Redis round trips that raised, by command.",
+    ("command",),
+)
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+async def timed[T](label: str, commands: list[list[Any]], call: Awaitable[T]) -> T:
+    """Await one round trip to Redis, recording it in the redis_* metrics"""
+    for command in commands:
+        redis_commands.inc((str(command[0]).upper(),))
+    started = time.perf_counter()
+    try:
+        return await call
+    except Exception:
+        redis_errors.inc((label,))
+        raise
+    finally:
+        redis_request_duration.observe((label,), time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (not BaseHTTPMiddleware, which adds a task and a
+    stream per request) recording the http_* metrics. The route template is
+    read from the scope after routing; unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        recorded = False
+        started = time.perf_counter()
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(
+                (method, template), time.perf_counter() - started
+            )
+            http_requests.inc((method, template, str(status)))
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            # Background tasks run after the last body message, within the
+            # app call: they are not part of the request's latency
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                record()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if not recorded:
+                record()
@@ -0,0 +1,111 @@
+"""
+Cold storage of expired polls, as local files (app.services.poll_lifecycle
+decides when a poll moves there). For each poll:
+
+- {poll_id}.poll: two lines, the stored poll record (poll_codec format) and
+  its final results, ready-to-send PollResults JSON;
+- {poll_id}.votes.ndjson.gz: every vote as one Vote JSON line, gzipped.
+
+Both are written under a temporary name and renamed into place, the votes
+first, so a .poll file always has its complete votes next to it. Archives
+never change after that: loaded ones are kept in a process cache.
+"""
+
+import gzip
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO, NamedTuple
+from uuid import UUID
+
+from app.models.Votes import Vote
+from app.services.cache import TTLCache
+
+
+class ArchivedPoll(NamedTuple):
+    poll_record: str
+    results_json: str
+
+
+def _fsync_and_rename(file: IO[bytes], path: Path) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+    os.replace(file.name, path)
+
+
+class ArchiveWriter:
+    """Streams a poll's votes to its archive, see PollArchive.writer"""
+
+    def __init__(self, archive: "PollArchive", poll_id: UUID) -> None:
+        self.archive = archive
+        self.poll_id = poll_id
+        self.votes = 0
+        self._file = open(archive.votes_path(poll_id).with_suffix(".tmp"), "wb")  # noqa: SIM115
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb")
+
+    def write_votes(self, votes: list[Vote]) -> None:
+        self._gzip.write(
+            b"".join(vote.model_dump_json().encode() + b"\n" for vote in votes)
+        )
+        self.votes += len(votes)
+
+    def commit(self, poll_record: str, results_json: str) -> None:
+        self._gzip.close()
+        _fsync_and_rename(self._file, self.archive.votes_path(self.poll_id))
+
+        poll_path = self.archive.poll_path(self.poll_id)
+        with open(poll_path.with_suffix(".tmp"), "wb") as file:
+            file.write(f"{poll_record}\n{results_json}\n".encode())
+            _fsync_and_rename(file, poll_path)
+        self.archive.cache.invalidate(self.poll_id)
+
+    def abort(self) -> None:
+        self._gzip.close()
+        self._file.close()
+        Path(self._file.name).unlink(missing_ok=True)
+
+
+class PollArchive:
+    def __init__(self, directory: Path, cache_size: int) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Archives are immutable, the TTL only bounds how long a removed
+        # archive can still be served by other processes
+        self.cache: TTLCache[UUID, ArchivedPoll] = TTLCache(cache_size, 3600.0)
+
+    def poll_path(self, poll_id: UUID) -> Path:
+        return self.directory / f"{poll_id}.poll"
+
+    def votes_path(self, poll_id: UUID) -> Path:
+        return self.directory / f"{poll_id}.votes.ndjson.gz"
+
+    def writer(self, poll_id: UUID) -> ArchiveWriter:
+        """
+        Start archiving a poll: votes go in with write_votes(), commit() makes
+        the archive visible, abort() throws it away.
+        """
+        return ArchiveWriter(self, poll_id)
+
+    def load(self, poll_id: UUID) -> ArchivedPoll | None:
+        if (archived := self.cache.get(poll_id)) is not None:
+            return archived
+        try:
+            poll_record, results_json = self.poll_path(poll_id).read_text().splitlines()
+        except FileNotFoundError:
+            return None
+
+        archived = ArchivedPoll(poll_record, results_json)
+        self.cache.set(poll_id, archived)
+        return archived
+
+    def read_votes(self, poll_id: UUID) -> Iterator[Vote]:
+        with gzip.open(self.votes_path(poll_id), "rb") as lines:
+            for line in lines:
+                yield Vote.model_validate_json(line)
+
+    def remove(self, poll_id: UUID) -> None:
+        # The .poll file first: the archive disappears as a whole
+        self.poll_path(poll_id).unlink(missing_ok=True)
+        self.votes_path(poll_id).unlink(missing_ok=True)
+        self.cache.invalidate(poll_id)
@@ -0,0 +1,61 @@
+"""
+Storage format of poll:{poll_id}.
+
+Version 2 keeps only the data, with instants as integer epoch milliseconds:
+
+    {"v":2,"id":"...","title":"...","created_at":1792341847123,
+     "expires_at":1792400000000,
+     "options":[{"id":"...","label":1,"description":"..."}]}
+
+pydantic reads integers this large as epoch milliseconds in its JSON parser
+(UTC-aware), so Poll.model_validate_json loads a version 2 record without
+any Python-level datetime parsing, about twice as fast as a legacy record.
+
+Presentation (VN time formatting of expires_at, the full_name computed field)
+happens when a Poll is serialized for a response, never in storage.
+
+Legacy records are Poll.model_dump_json() documents without "v", with
+expires_at as a "dd-mm-YYYY H:M:S" string in VN time. decode_poll still
+reads them; utils rewrites them in version 2 the first time they are read
+(or in bulk with python -m app.commands.migrate_poll_storage).
+"""
+
+import json
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from app.models.Polls import Poll
+
+STORAGE_VERSION = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MILLISECOND = timedelta(milliseconds=1)
+
+
+def _to_epoch_ms(value: datetime) -> int:
+    return (value - EPOCH) // MILLISECOND
+
+
+def encode_poll(poll: Poll) -> str:
+    document: dict[str, Any] = {
+        "v": STORAGE_VERSION,
+        "id": str(poll.id),
+        "title": poll.title,
+        "created_at": _to_epoch_ms(poll.created_at),
+        "expires_at": None
+        if poll.expires_at is None
+        else _to_epoch_ms(poll.expires_at),
+        "options": [
+            {"id": str(c.id), "label": c.label, "description": c.description}
+            for c in poll.options
+        ],
+    }
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+
+def is_current(stored: str) -> bool:
+    return stored.startswith('{"v":2,')
+
+
+def decode_poll(stored: str) -> Poll:
+    """Either format: "v" is ignored as an extra field"""
+    return Poll.model_validate_json(stored)
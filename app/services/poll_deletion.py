@@ -0,0 +1,120 @@
+"""
+Background reclaim of the votes of deleted polls.
+
+utils.delete_poll removes a poll from every read at once. A vote hash of
+more than POLL_DELETE_BATCH_SIZE voters would block Redis for everyone if
+deleted with one DEL, so it is renamed to a tombstone instead. The tombstone
+is then emptied with HSCAN + HDEL batches: right after the DELETE request,
+as a background task, and by python -m app.commands.purge_deleted_polls for
+whatever a crashed or frozen process left behind.
+
+Progress lives in Redis: the batch cursor is saved with every HDEL, and the
+remaining voters are the tombstone's HLEN. Batches are idempotent, so any
+number of purgers can resume the same poll from wherever it stopped.
+"""
+
+import logging
+from datetime import UTC, datetime
+from typing import cast
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.services import utils
+
+logger = logging.getLogger(__name__)
+
+settings = utils.settings
+
+
+class DeletionProgress(BaseModel):
+    poll_id: UUID
+    total: int
+    remaining: int
+    deleted_at: datetime
+
+
+async def purge_batch(poll_id: UUID, cursor: int) -> tuple[int, bool]:
+    """
+    Delete one batch of the poll's tombstoned votes. Returns the cursor to
+    continue from and whether the cleanup is finished.
+    """
+    redis = utils.get_redis()
+    key = utils.deleted_votes_key(poll_id)
+    progress = utils.deletion_progress_key(poll_id)
+
+    next_cursor, votes = await redis.hscan(
+        key, cursor, count=settings.POLL_DELETE_BATCH_SIZE
+    )
+    pipeline = redis.pipeline()
+    if votes:
+        pipeline.hdel(key, *votes)
+    pipeline.hset(progress, "cursor", str(next_cursor))
+    pipeline.exists(key)
+    *_, left = await pipeline.exec()
+    if left or next_cursor != 0:
+        # A full pass can leave votes behind when the hash was rehashed
+        # meanwhile: the next pass starts over from cursor 0
+        return next_cursor, False
+
+    transaction = redis.multi()
+    transaction.delete(progress)
+    transaction.zrem(utils.POLLS_DELETING, str(poll_id))
+    await transaction.exec()
+    return 0, True
+
+
+async def purge_votes(poll_id: UUID) -> int:
+    """Reclaim all the tombstoned votes of a deleted poll, returns batches run"""
+    stored_cursor = await utils.get_redis().hget(
+        utils.deletion_progress_key(poll_id), "cursor"
+    )
+    cursor = int(stored_cursor or 0)
+    batches = 0
+    while True:
+        cursor, finished = await purge_batch(poll_id, cursor)
+        batches += 1
+        if finished:
+            return batches
+
+
+async def purge_votes_in_background(poll_id: UUID) -> None:
+    try:
+        batches = await purge_votes(poll_id)
+    except Exception:
+        # Still listed in polls:deleting, purge_deleted_polls resumes it
+        logger.exception("Reclaiming the votes of deleted poll %s failed", poll_id)
+        return
+    logger.info(
+        "Reclaimed the votes of deleted poll %s in %d batches", poll_id, batches
+    )
+
+
+async def get_pending_deletions(limit: int = 100) -> list[DeletionProgress]:
+    """Deleted polls whose votes are still being reclaimed, oldest first"""
+    redis = utils.get_redis()
+    poll_ids = cast(list[str], await redis.zrange(utils.POLLS_DELETING, 0, limit - 1))
+    if not poll_ids:
+        return []
+
+    pipeline = redis.pipeline()
+    for poll_id in poll_ids:
+        pipeline.hgetall(utils.deletion_progress_key(UUID(poll_id)))
+        pipeline.hlen(utils.deleted_votes_key(UUID(poll_id)))
+    replies = await pipeline.exec()
+
+    pending = []
+    for poll_id, progress, remaining in zip(
+        poll_ids, replies[::2], replies[1::2], strict=True
+    ):
+        pending.append(
+            DeletionProgress(
+                poll_id=UUID(poll_id),
+                total=int(progress.get("total", remaining)),
+                remaining=remaining,
+                deleted_at=datetime.fromtimestamp(
+                    int(progress.get("deleted_at", 0)) / 1000, UTC
+                ),
+            )
+        )
+    return pending
@@ -0,0 +1,152 @@
+"""
+End of life of expired polls. Once a poll is POLL_ARCHIVE_GRACE_SECONDS past
+its expires_at (time for queued votes to be committed), its final results and
+its votes go to the archive (app.services.poll_archive) and its keys leave
+Redis, so the hot keyspace grows with the open polls only. The poll keeps its
+entries in the listing indexes, and every read falls back to the archive.
+
+Polls waiting for this are listed in polls:to_archive by expiry. A poll that
+got votes while it was being archived stays listed and is retried by the next
+run (python -m app.commands.archive_expired_polls).
+"""
+
+import logging
+from datetime import UTC, datetime
+from enum import Enum
+from typing import cast
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.services import poll_deletion, utils
+from app.services.poll_archive import PollArchive
+from app.services.poll_codec import decode_poll, encode_poll
+from app.services.scripts import EVICT_ARCHIVED_POLL
+from app.services.vote_codec import decode_vote
+
+logger = logging.getLogger(__name__)
+
+settings = utils.settings
+
+BATCH_SIZE = 500
+
+
+class ArchiveStatus(Enum):
+    ARCHIVED = "archived"
+    # Votes arrived meanwhile, left for the next run
+    RETRY = "retry"
+    # Deleted before it could be archived
+    GONE = "gone"
+
+
+class ArchiveOutcome(BaseModel):
+    archived: int = 0
+    votes: int = 0
+    # Votes arrived meanwhile, left for the next run
+    retried: int = 0
+    # Deleted before they could be archived
+    gone: int = 0
+
+
+async def archive_poll(
+    archive: PollArchive, poll_id: UUID
+) -> tuple[ArchiveStatus, int]:
+    """Archive one poll and drop its hot keys, returns how many votes it had"""
+    redis = utils.get_redis()
+    poll_record = await redis.get(f"poll:{poll_id}")
+    if not poll_record:
+        await redis.zrem(utils.POLLS_TO_ARCHIVE, str(poll_id))
+        return ArchiveStatus.GONE, 0
+    poll = decode_poll(poll_record)
+
+    writer = archive.writer(poll_id)
+    try:
+        # HSCAN can return a field twice, the emails seen tell them apart
+        seen: set[str] = set()
+        cursor = 0
+        while True:
+            cursor, stored = await redis.hscan(
+                f"votes:{poll_id}", cursor, count=BATCH_SIZE
+            )
+            fresh = {e: v for e, v in stored.items() if e not in seen}
+            seen.update(fresh)
+            votes = [decode_vote(poll, e, v) for e, v in fresh.items()]
+            writer.write_votes([vote for vote in votes if vote is not None])
+            if cursor == 0:
+                break
+
+        # Read after the votes: a vote counted in the results but missed by
+        # the scan changes the hash length, which the eviction checks
+        results_json = await utils.get_poll_results_json(poll_id)
+        if results_json is None:
+            writer.abort()
+            return ArchiveStatus.GONE, 0
+        writer.commit(encode_poll(poll), results_json)
+    except BaseException:
+        writer.abort()
+        raise
+
+    now_ms = int(datetime.now(UTC).timestamp() * 1000)
+    left = int(
+        await EVICT_ARCHIVED_POLL(
+            redis,
+            keys=[
+                f"poll:{poll_id}",
+                f"votes_count:{poll_id}",
+                f"poll_results:{poll_id}",
+                f"votes:{poll_id}",
+                utils.deleted_votes_key(poll_id),
+                utils.POLLS_DELETING,
+                utils.deletion_progress_key(poll_id),
+                utils.POLLS_TO_ARCHIVE,
+                *utils.timeline_keys(poll),
+            ],
+            args=[
+                str(poll_id),
+                str(now_ms),
+                str(settings.POLL_DELETE_BATCH_SIZE),
+                str(len(seen)),
+            ],
+        )
+    )
+    if left < 0:
+        archive.remove(poll_id)
+        return (ArchiveStatus.RETRY if left == -1 else ArchiveStatus.GONE), 0
+    if left:
+        await poll_deletion.purge_votes(poll_id)
+    return ArchiveStatus.ARCHIVED, len(seen)
+
+
+async def archive_expired_polls() -> ArchiveOutcome:
+    """Archive the polls past their grace period, the earliest expired first"""
+    if utils.poll_archive is None:
+        raise RuntimeError("POLL_ARCHIVE_DIR must be set to archive polls")
+
+    cutoff = datetime.now(UTC).timestamp() - settings.POLL_ARCHIVE_GRACE_SECONDS
+    outcome = ArchiveOutcome()
+    while True:
+        # Polls to retry stay listed: skip past them
+        poll_ids = cast(
+            list[str],
+            await utils.get_redis().zrange(
+                utils.POLLS_TO_ARCHIVE,
+                "-inf",
+                str(cutoff),
+                sortby="BYSCORE",
+                offset=outcome.retried,
+                count=BATCH_SIZE,
+            ),
+        )
+        if not poll_ids:
+            return outcome
+
+        for poll_id in poll_ids:
+            status, votes = await archive_poll(utils.poll_archive, UUID(poll_id))
+            if status == ArchiveStatus.ARCHIVED:
+                outcome.archived += 1
+                outcome.votes += votes
+            elif status == ArchiveStatus.RETRY:
+                logger.info("Poll %s got new votes, archived next run", poll_id)
+                outcome.retried += 1
+            else:
+                outcome.gone += 1
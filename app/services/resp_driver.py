@@ -0,0 +1,97 @@
+"""
+REDIS_DRIVER=resp: the native Redis protocol through redis-py, see
+app/services/drivers.py. Imported only when that driver is selected.
+"""
+
+from typing import Any
+
+import redis.asyncio
+from redis.exceptions import NoScriptError, ResponseError
+from upstash_redis.errors import UpstashError
+from upstash_redis.format import cast_response
+
+from app.services import metrics
+from app.services.drivers import StorageDriver, StoragePipeline, command_label
+
+
+def _upstash_error(e: ResponseError) -> UpstashError:
+    # redis-py strips the error code of the errors it has a class for,
+    # Upstash passes it through (LuaScript looks for NOSCRIPT)
+    if isinstance(e, NoScriptError):
+        return UpstashError(f"NOSCRIPT {e}")
+    return UpstashError(str(e))
+
+
+class RespPipeline(StoragePipeline):
+    def __init__(self, driver: "RespDriver", transaction: bool) -> None:
+        self._driver = driver
+        self._transaction = transaction
+        self._command_stack: list[list[Any]] = []
+
+    def execute(self, command: list[Any]) -> "RespPipeline":
+        self._command_stack.append(command)
+        return self
+
+    async def exec(self) -> list[Any]:
+        commands, self._command_stack = self._command_stack, []
+        if not self._driver.instrumented:
+            return await self._send(commands)
+        label = "MULTI" if self._transaction else "PIPELINE"
+        return await metrics.timed(label, commands, self._send(commands))
+
+    async def _send(self, commands: list[list[Any]]) -> list[Any]:
+        pipeline = self._driver.client.pipeline(transaction=self._transaction)
+        for command in commands:
+            pipeline.execute_command(*command)
+        try:
+            replies = await pipeline.execute()
+        except ResponseError as e:
+            raise _upstash_error(e) from e
+        return [
+            cast_response(command, reply)
+            for command, reply in zip(commands, replies, strict=True)
+        ]
+
+
+class RespDriver(StorageDriver):
+    def __init__(self, client: "redis.asyncio.Redis", instrumented: bool) -> None:
+        self.client = client
+        self.instrumented = instrumented
+        # Raw replies, as the REST API sends them: cast_response shapes them
+        client.response_callbacks = {}
+
+    @classmethod
+    def from_url(
+        cls, url: str, pool_size: int, pool_timeout: float, instrumented: bool
+    ) -> "RespDriver":
+        pool = redis.asyncio.BlockingConnectionPool.from_url(
+            url,
+            max_connections=pool_size,
+            timeout=pool_timeout,
+            decode_responses=True,
+            protocol=2,
+        )
+        return cls(redis.asyncio.Redis(connection_pool=pool), instrumented)
+
+    async def execute(self, command: list[Any]) -> Any:
+        if not self.instrumented:
+            return await self._send(command)
+        return await metrics.timed(
+            command_label(command), [command], self._send(command)
+        )
+
+    async def _send(self, command: list[Any]) -> Any:
+        try:
+            reply = await self.client.execute_command(*command)  # type: ignore[no-untyped-call]
+        except ResponseError as e:
+            raise _upstash_error(e) from e
+        return cast_response(command, reply)
+
+    def pipeline(self) -> RespPipeline:
+        return RespPipeline(self, transaction=False)
+
+    def multi(self) -> RespPipeline:
+        return RespPipeline(self, transaction=True)
+
+    async def close(self) -> None:
+        await self.client.aclose()
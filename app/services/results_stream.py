@@ -0,0 +1,107 @@
+"""
+Fan-out of live poll results to streaming subscribers. Each process runs at
+most one refresher per watched poll: it reads the materialized results
+document once per tick and hands every change to all subscribers, so Redis
+load depends on the number of watched polls, not on the number of viewers.
+"""
+
+import asyncio
+import contextvars
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import UUID
+
+from app.services import utils
+
+logger = logging.getLogger(__name__)
+
+
+class ResultsBroadcaster:
+    """
+    Every subscriber gets a one-slot mailbox. A subscriber that has not
+    consumed the previous update has it replaced by the newest one, so a slow
+    client only ever skips intermediate results and never holds memory or
+    slows down the others.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._subscribers: dict[UUID, set[asyncio.Queue[str | None]]] = {}
+        self._refreshers: dict[UUID, asyncio.Task[None]] = {}
+        self._latest: dict[UUID, str] = {}
+
+    async def subscribe(
+        self, poll_id: UUID, heartbeat: float
+    ) -> AsyncIterator[str | None]:
+        """
+        Yield the poll's results JSON now and whenever it changes, and None
+        when nothing changed for `heartbeat` seconds. Ends once the poll is
+        deleted; closing the iterator unsubscribes.
+        """
+        mailbox: asyncio.Queue[str | None] = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(poll_id, set()).add(mailbox)
+        if (latest := self._latest.get(poll_id)) is not None:
+            mailbox.put_nowait(latest)
+        refresher = self._refreshers.get(poll_id)
+        if refresher is None or refresher.done():
+            # The refresher outlives the request that started it, so it must
+            # not inherit that request's Redis loader and its memoized reads
+            self._refreshers[poll_id] = asyncio.create_task(
+                self._refresh(poll_id), context=contextvars.Context()
+            )
+
+        try:
+            while True:
+                try:
+                    results = await asyncio.wait_for(mailbox.get(), heartbeat)
+                except TimeoutError:
+                    yield None
+                    continue
+                if results is None:
+                    return
+                yield results
+        finally:
+            self._unsubscribe(poll_id, mailbox)
+
+    def _unsubscribe(self, poll_id: UUID, mailbox: asyncio.Queue[str | None]) -> None:
+        subscribers = self._subscribers.get(poll_id, set())
+        subscribers.discard(mailbox)
+        if subscribers:
+            return
+        # Last viewer gone: stop polling Redis for this poll
+        self._subscribers.pop(poll_id, None)
+        self._latest.pop(poll_id, None)
+        if (refresher := self._refreshers.pop(poll_id, None)) is not None:
+            refresher.cancel()
+
+    def _publish(self, poll_id: UUID, results: str | None) -> None:
+        for mailbox in self._subscribers.get(poll_id, ()):
+            if mailbox.full():
+                mailbox.get_nowait()
+            mailbox.put_nowait(results)
+
+    async def _refresh(self, poll_id: UUID) -> None:
+        while True:
+            try:
+                results = await utils.get_poll_results_json(poll_id)
+            except Exception:
+                # Keep the streams open through a Redis hiccup
+                logger.exception("Refreshing results of poll %s failed", poll_id)
+            else:
+                if results is None:
+                    self._publish(poll_id, None)
+                    return
+                if results != self._latest.get(poll_id):
+                    self._latest[poll_id] = results
+                    self._publish(poll_id, results)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "polls": len(self._refreshers),
+            "subscribers": sum(map(len, self._subscribers.values())),
+        }
+
+
+broadcaster = ResultsBroadcaster(utils.settings.RESULTS_STREAM_INTERVAL_SECONDS)
@@ -0,0 +1,229 @@
+from hashlib import sha1
+from typing import Any
+
+from upstash_redis.errors import UpstashError
+
+from app.services.drivers import StorageDriver, StoragePipeline
+
+
+class LuaScript:
+    """
+    A server-side script called by its SHA1 digest, so the script body only
+    crosses the network the first time a Redis instance sees it.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.sha = sha1(source.encode(), usedforsecurity=False).hexdigest()
+
+    async def __call__(
+        self, client: StorageDriver, keys: list[str], args: list[str]
+    ) -> Any:
+        try:
+            return await client.evalsha(self.sha, keys=keys, args=args)
+        except UpstashError as e:
+            if "NOSCRIPT" not in str(e):
+                raise
+            return await client.eval(self.source, keys=keys, args=args)
+
+    async def load(self, client: StorageDriver) -> None:
+        """Make sure the script is cached before queueing it in a pipeline"""
+        await client.script_load(self.source)
+
+    def queue(
+        self, pipeline: StoragePipeline, keys: list[str], args: list[str]
+    ) -> None:
+        pipeline.evalsha(self.sha, keys=keys, args=args)
+
+
+# KEYS: votes:{poll_id}, votes_count:{poll_id}, poll_results:{poll_id},
+#       poll:{poll_id}, then optionally the minute and hour timeline hashes
+#       of the vote
+# ARGV: voter email, stored vote (see vote_codec), choice id, the two
+#       timeline fields and the two timeline expiry instants (empty without
+#       timeline keys), results document head ('{"id":...,"title":...'),
+#       then a (choice id, description json) pair per option, in option order
+# Returns 1 when the vote was recorded, 0 when the voter had already voted,
+# -1 when the poll no longer exists (deleted or archived since the caller
+# read it): nothing is written then, so no key of the poll comes back.
+# A recorded vote also bumps its timeline counters (see timeline.py) and
+# rewrites the poll's results document, sorted by vote count with ties kept
+# in option order, byte for byte what PollResults.model_dump_json() would
+# produce.
+COMMIT_VOTE = LuaScript(
+    """
+if redis.call("EXISTS", KEYS[4]) == 0 then
+    return -1
+end
+if redis.call("HSETNX", KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+redis.call("HINCRBY", KEYS[2], ARGV[3], 1)
+if #KEYS == 6 then
+    redis.call("HINCRBY", KEYS[5], ARGV[4], 1)
+    redis.call("EXPIREAT", KEYS[5], ARGV[6])
+    redis.call("HINCRBY", KEYS[6], ARGV[5], 1)
+    redis.call("EXPIREAT", KEYS[6], ARGV[7])
+end
+
+local choice_ids = {}
+for i = 9, #ARGV, 2 do
+    choice_ids[#choice_ids + 1] = ARGV[i]
+end
+local counts = redis.call("HMGET", KEYS[2], unpack(choice_ids))
+
+local results = {}
+local total = 0
+for i, count in ipairs(counts) do
+    count = tonumber(count) or 0
+    total = total + count
+    results[i] = {count = count, position = i, description = ARGV[8 + 2 * i]}
+end
+table.sort(results, function(a, b)
+    if a.count ~= b.count then
+        return a.count > b.count
+    end
+    return a.position < b.position
+end)
+
+local parts = {}
+for i, result in ipairs(results) do
+    parts[i] = '{"description":' .. result.description
+        .. ',"vote_count":' .. result.count .. '}'
+end
+redis.call("SET", KEYS[3], ARGV[8] .. ',"total_votes":' .. total
+    .. ',"results":[' .. table.concat(parts, ",") .. "]}")
+return 1
+"""
+)
+
+
+# KEYS: poll:{poll_id}, poll_results:{poll_id}
+# ARGV: results document built from the poll and its counters
+# Stores the document unless one is already there (a concurrent vote has
+# just written a newer one), and returns whichever is stored. Returns nil
+# without writing when the poll no longer exists, so a caller building from
+# a stale copy of the poll cannot bring back the document of a deleted poll.
+STORE_POLL_RESULTS = LuaScript(
+    """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return false
+end
+redis.call("SET", KEYS[2], ARGV[1], "NX")
+return redis.call("GET", KEYS[2])
+"""
+)
+
+
+# Shared by the scripts dropping a poll's votes: a vote hash of up to
+# inline_max votes is deleted right away, a larger one (too large to DEL
+# without blocking Redis) is renamed to its tombstone in O(1) and queued in
+# polls:deleting for poll_deletion to empty in batches. Returns the number
+# of votes left for that background cleanup (0: none).
+_RECLAIM_VOTES = """
+local function reclaim_votes(votes, tombstone, deleting, progress, poll_id, now, inline_max)
+    local count = redis.call("HLEN", votes)
+    if count <= tonumber(inline_max) then
+        redis.call("DEL", votes)
+        return 0
+    end
+    redis.call("RENAME", votes, tombstone)
+    redis.call("HSET", progress, "total", count, "cursor", "0", "deleted_at", now)
+    redis.call("ZADD", deleting, now, poll_id)
+    return count
+end
+"""
+
+
+# KEYS: poll:{poll_id}, votes_count:{poll_id}, poll_results:{poll_id},
+#       polls:created, polls:expires, votes:{poll_id}, the tombstone of
+#       votes:{poll_id}, polls:deleting, the deletion's progress hash,
+#       polls:to_archive, then the poll's timeline hashes (see timeline.py)
+# ARGV: poll id, deletion time (epoch ms), largest vote hash deleted inline
+# Returns how many votes are left for the background cleanup (0: none).
+DELETE_POLL = LuaScript(
+    _RECLAIM_VOTES
+    + """
+redis.call("DEL", KEYS[1], KEYS[2], KEYS[3])
+if #KEYS > 10 then
+    redis.call("DEL", unpack(KEYS, 11))
+end
+redis.call("ZREM", KEYS[4], ARGV[1])
+redis.call("ZREM", KEYS[5], ARGV[1])
+redis.call("ZREM", KEYS[10], ARGV[1])
+return reclaim_votes(KEYS[6], KEYS[7], KEYS[8], KEYS[9], ARGV[1], ARGV[2], ARGV[3])
+"""
+)
+
+
+# KEYS: poll:{poll_id}, votes_count:{poll_id}, poll_results:{poll_id},
+#       votes:{poll_id}, the tombstone of votes:{poll_id}, polls:deleting,
+#       the cleanup's progress hash, polls:to_archive, then the poll's
+#       timeline hashes (see timeline.py)
+# ARGV: poll id, eviction time (epoch ms), largest vote hash deleted
+#       inline, number of votes in the archive
+# Drops the hot keys of a poll that was just archived, as long as the
+# archive is still complete, and takes it off polls:to_archive. The poll
+# stays in the listing indexes; its timeline is not archived.
+# Returns the votes left for the background cleanup, -1 when votes arrived
+# since the archive was written, -2 when the poll was deleted meanwhile.
+EVICT_ARCHIVED_POLL = LuaScript(
+    _RECLAIM_VOTES
+    + """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return -2
+end
+if redis.call("HLEN", KEYS[4]) ~= tonumber(ARGV[4]) then
+    return -1
+end
+redis.call("DEL", KEYS[1], KEYS[2], KEYS[3])
+if #KEYS > 8 then
+    redis.call("DEL", unpack(KEYS, 9))
+end
+redis.call("ZREM", KEYS[8], ARGV[1])
+return reclaim_votes(KEYS[4], KEYS[5], KEYS[6], KEYS[7], ARGV[1], ARGV[2], ARGV[3])
+"""
+)
+
+
+# KEYS: poll:{poll_id}, votes:{poll_id}
+# ARGV: a (voter email, stored vote) pair per vote to rewrite
+# Overwrites votes that are still stored, leaving out any removed since
+# they were read, so a rewrite never recreates the vote hash of a poll
+# deleted or evicted meanwhile. Returns the number of votes rewritten, -1
+# when the poll no longer exists.
+REWRITE_VOTES = LuaScript(
+    """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return -1
+end
+local rewritten = 0
+for i = 1, #ARGV, 2 do
+    if redis.call("HEXISTS", KEYS[2], ARGV[i]) == 1 then
+        redis.call("HSET", KEYS[2], ARGV[i], ARGV[i + 1])
+        rewritten = rewritten + 1
+    end
+end
+return rewritten
+"""
+)
+
+
+# KEYS: votes:{poll_id}, votes_count:{poll_id}, poll_results:{poll_id}
+# ARGV: number of votes the recount saw, then a (choice id, count) pair per
+#       choice with votes
+# Replaces the vote counters with the recount, unless the vote hash changed
+# size since (returns 0). The results document is dropped, to be rebuilt
+# from the new counters on the next read.
+REPAIR_VOTE_COUNTS = LuaScript(
+    """
+if redis.call("HLEN", KEYS[1]) ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call("DEL", KEYS[2], KEYS[3])
+if #ARGV > 1 then
+    redis.call("HSET", KEYS[2], unpack(ARGV, 2))
+end
+return 1
+"""
+)
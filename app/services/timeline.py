@@ -0,0 +1,144 @@
+"""
+Votes over time, per choice, without reading the votes themselves.
+
+COMMIT_VOTE bumps two counters for every recorded vote, keyed by the
+choice's label and the time it was cast:
+
+- by minute, in one hash per hour: timeline:{poll_id}:m:{hour start}, field
+  "<minute of the hour>:<label>";
+- by hour, in one hash per day: timeline:{poll_id}:h:{day start}, field
+  "<hour of the day>:<label>".
+
+At most 60 * 5 (resp. 24 * 5) small fields per hash, so Redis keeps every
+hash in its compact listpack encoding. Each hash expires its retention after
+the end of its period: memory holds TIMELINE_MINUTE_RETENTION_SECONDS of
+minutes and TIMELINE_HOUR_RETENTION_SECONDS of hours, the longer history
+being the downsampled one. Older buckets read as zero.
+"""
+
+from datetime import UTC, datetime
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.models.Polls import Poll
+from app.services.drivers import StorageDriver
+
+Resolution = Literal["minute", "hour"]
+
+# Bucket width and the period one hash covers, in seconds
+_LAYOUT: dict[Resolution, tuple[int, int]] = {
+    "minute": (60, 3600),
+    "hour": (3600, 86400),
+}
+
+
+def step_seconds(resolution: Resolution) -> int:
+    return _LAYOUT[resolution][0]
+
+
+class ChoiceSeries(BaseModel):
+    choice_id: UUID
+    description: str
+    counts: list[int]
+
+
+class Timeline(BaseModel):
+    poll_id: UUID
+    resolution: Resolution
+    # Start of the first bucket; bucket i starts at start + i * step_seconds
+    start: datetime
+    step_seconds: int
+    series: list[ChoiceSeries]
+
+
+class VoteTimeline:
+    def __init__(self, minute_retention: int, hour_retention: int) -> None:
+        self.retention: dict[Resolution, int] = {
+            "minute": minute_retention,
+            "hour": hour_retention,
+        }
+
+    def key(self, poll_id: UUID, resolution: Resolution, period: int) -> str:
+        return f"timeline:{poll_id}:{resolution[0]}:{period}"
+
+    def commit_keys(self, poll_id: UUID, voted_at: datetime) -> list[str]:
+        """The minute and hour hashes a vote cast at voted_at counts in"""
+        epoch = int(voted_at.timestamp())
+        return [
+            self.key(poll_id, resolution, epoch - epoch % period)
+            for resolution, (_, period) in _LAYOUT.items()
+        ]
+
+    def poll_keys(self, poll_id: UUID, since: datetime, until: datetime) -> list[str]:
+        """
+        Every hash the votes cast from since to until count in, leaving out
+        the ones already expired at until
+        """
+        first_vote, last_vote = int(since.timestamp()), int(until.timestamp())
+        keys = []
+        for resolution, (_, period) in _LAYOUT.items():
+            first = max(first_vote, last_vote - period - self.retention[resolution])
+            keys += [
+                self.key(poll_id, resolution, period_start)
+                for period_start in range(first - first % period, last_vote + 1, period)
+            ]
+        return keys
+
+    def commit_args(self, label: int, voted_at: datetime) -> list[str]:
+        """The two fields, then the two expiry instants, of commit_keys"""
+        epoch = int(voted_at.timestamp())
+        fields, expire_at = [], []
+        for resolution, (step, period) in _LAYOUT.items():
+            fields.append(f"{epoch % period // step}:{label}")
+            period_end = epoch - epoch % period + period
+            expire_at.append(str(period_end + self.retention[resolution]))
+        return fields + expire_at
+
+    async def get(
+        self,
+        client: StorageDriver,
+        poll: Poll,
+        resolution: Resolution,
+        start: datetime,
+        end: datetime,
+    ) -> Timeline:
+        """
+        Every bucket from the one holding start to the one holding end, one
+        HGETALL per hash covering them, in a single pipeline
+        """
+        step, period = _LAYOUT[resolution]
+        first = int(start.timestamp()) // step * step
+        last = int(end.timestamp()) // step * step
+        periods = list(range(first - first % period, last + 1, period))
+
+        pipeline = client.pipeline()
+        for period_start in periods:
+            pipeline.hgetall(self.key(poll.id, resolution, period_start))
+        hashes: list[dict[str, str]] = await pipeline.exec()
+
+        labels = {choice.label: i for i, choice in enumerate(poll.options)}
+        counts = [[0] * ((last - first) // step + 1) for _ in poll.options]
+        for period_start, fields in zip(periods, hashes, strict=True):
+            for field, count in fields.items():
+                offset, _, label = field.partition(":")
+                bucket = (period_start + int(offset) * step - first) // step
+                choice = labels.get(int(label))
+                if choice is not None and 0 <= bucket < len(counts[choice]):
+                    counts[choice][bucket] = int(count)
+
+        return Timeline(
+            poll_id=poll.id,
+            resolution=resolution,
+            start=datetime.fromtimestamp(first, UTC),
+            step_seconds=step,
+            series=[
+                ChoiceSeries(
+                    choice_id=choice.id,
+                    description=choice.description,
+                    counts=choice_counts,
+                )
+                for choice, choice_counts in zip(poll.options, counts, strict=True)
+            ],
+        )
@@ -1,53 +1,310 @@
+import asyncio
+from datetime import UTC, datetime
+from enum import Enum
+from math import inf
+from pathlib import Path
+from typing import cast
 from uuid import UUID
 
-from upstash_redis import Redis
+from pydantic import BaseModel, ConfigDict, NonNegativeInt
+from pydantic_core import to_json
 
 from app.models.Polls import Poll
 from app.models.Results import PollResults, Result
 from app.models.Votes import Vote
+from app.services import loader
+from app.services.cache import TTLCache
+from app.services.drivers import StorageDriver, StoragePipeline, create_driver
+from app.services.poll_archive import ArchivedPoll, PollArchive
+from app.services.poll_codec import decode_poll, encode_poll, is_current
+from app.services.scripts import COMMIT_VOTE, DELETE_POLL, STORE_POLL_RESULTS
+from app.services.timeline import VoteTimeline
+from app.services.vote_codec import decode_vote, encode_vote
 from config import get_settings
 
 settings = get_settings()
-if settings.UPSTASH_REDIS_URL is None or settings.UPSTASH_REDIS_TOKEN is None:
-    raise RuntimeError(
-        "UPSTASH_REDIS_URL and UPSTASH_REDIS_TOKEN must be set in .env or environment"
+_redis_client: StorageDriver | None = None
+
+
+def get_redis() -> StorageDriver:
+    """
+    The storage driver, built on first use: constructing its HTTP client or
+    connection pool is left out of the import, i.e. out of every cold start
+    that does not reach Redis.
+    """
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = create_driver(settings)
+    return _redis_client
+
+
+# Parsed polls by id, and polls rendered as response JSON. Another process
+# deleting a poll is only noticed once the entry's TTL runs out.
+poll_cache: TTLCache[UUID, Poll] | None = (
+    TTLCache(settings.POLL_CACHE_MAX_SIZE, settings.POLL_CACHE_TTL_SECONDS)
+    if settings.POLL_CACHE_ENABLED
+    else None
+)
+poll_json_cache: TTLCache[UUID, str] | None = (
+    TTLCache(settings.POLL_CACHE_MAX_SIZE, settings.POLL_CACHE_TTL_SECONDS)
+    if settings.POLL_CACHE_ENABLED
+    else None
+)
+
+# Expired polls moved out of Redis by poll_lifecycle. Every read falls back
+# to it for polls Redis does not have.
+poll_archive: PollArchive | None = (
+    PollArchive(Path(settings.POLL_ARCHIVE_DIR), settings.POLL_CACHE_MAX_SIZE)
+    if settings.POLL_ARCHIVE_DIR
+    else None
+)
+
+
+def get_archived_poll(poll_id: UUID) -> ArchivedPoll | None:
+    return None if poll_archive is None else poll_archive.load(poll_id)
+
+
+# Vote counters by minute and by hour, bumped by COMMIT_VOTE
+vote_timeline: VoteTimeline | None = (
+    VoteTimeline(
+        settings.TIMELINE_MINUTE_RETENTION_SECONDS,
+        settings.TIMELINE_HOUR_RETENTION_SECONDS,
     )
+    if settings.TIMELINE_ENABLED
+    else None
+)
 
-redis_client = Redis(url=settings.UPSTASH_REDIS_URL, token=settings.UPSTASH_REDIS_TOKEN)
 
+POLLS_BY_CREATED = "polls:created"
+POLLS_BY_EXPIRES = "polls:expires"
+# Deleted polls whose votes are still being reclaimed, by deletion time
+POLLS_DELETING = "polls:deleting"
+# Polls with an expiry that poll_lifecycle has not archived yet, by expiry
+POLLS_TO_ARCHIVE = "polls:to_archive"
 
-def get_all_polls() -> list[Poll]:
-    poll_keys = redis_client.keys("poll:*")
 
-    # polls = []
+def deleted_votes_key(poll_id: UUID) -> str:
+    return f"deleted:votes:{poll_id}"
 
-    # for key in poll_keys:
-    #     poll_json = redis_client.get(key)
-    #     if poll_json:
-    #         polls.append(Poll.model_validate_json(poll_json))
 
-    poll_jsons = redis_client.mget(*poll_keys)
+def deletion_progress_key(poll_id: UUID) -> str:
+    return f"deleted:progress:{poll_id}"
+
+
+# Past any datetime (year 9999 is ~2.5e11): polls without an expiry stay
+# active forever, in creation order. Scores of their own, rather than all
+# sharing +inf, keep every listing page one short ZRANGE instead of an
+# offset walking the whole tie.
+NO_EXPIRY_SCORE = 1e12
+
+
+def _index_poll(pipeline: StoragePipeline, poll: Poll) -> None:
+    created = str(poll.created_at.timestamp())
+    expires = str(
+        NO_EXPIRY_SCORE + poll.created_at.timestamp()
+        if poll.expires_at is None
+        else poll.expires_at.timestamp()
+    )
+
+    pipeline.execute(["ZADD", POLLS_BY_CREATED, created, str(poll.id)])
+    pipeline.execute(["ZADD", POLLS_BY_EXPIRES, expires, str(poll.id)])
+    if poll.expires_at is not None:
+        pipeline.execute(["ZADD", POLLS_TO_ARCHIVE, expires, str(poll.id)])
+
+
+class PageCursor(BaseModel):
+    """Position after the last poll of a page: its index score, and how many
+    polls sharing that exact score were already returned"""
+
+    # Polls indexed before every score was finite sit at +inf
+    model_config = ConfigDict(ser_json_inf_nan="strings")
+
+    score: float
+    skip: NonNegativeInt
+
+
+async def _get_polls_page(
+    index: str,
+    min_score: float,
+    max_score: float,
+    limit: int,
+    after: PageCursor | None,
+    min_exclusive: bool = False,
+) -> tuple[list[Poll], PageCursor | None]:
+    start = f"({min_score}" if min_exclusive else str(min_score)
+    offset = 0
+    resume_score = None
+    if after is not None and (
+        after.score > min_score or (after.score == min_score and not min_exclusive)
+    ):
+        resume_score, offset = after.score, after.skip
+        start = str(after.score)
+
+    # One extra entry tells whether there is a next page. Polls are ordered by
+    # (score, id), so the walk is stable while polls are added or removed.
+    entries = cast(
+        list[tuple[str, float]],
+        await get_redis().zrange(
+            index,
+            start,
+            str(max_score),
+            sortby="BYSCORE",
+            offset=offset,
+            count=limit + 1,
+            withscores=True,
+        ),
+    )
+    page = entries[:limit]
+
+    next_cursor = None
+    if len(entries) > limit:
+        last_score = page[-1][1]
+        skip = sum(1 for _, score in page if score == last_score)
+        if offset and last_score == resume_score:
+            # The whole page shares the score the previous page ended on
+            skip += offset
+        next_cursor = PageCursor(score=last_score, skip=skip)
+
+    if not page:
+        return [], next_cursor
+
+    poll_jsons = await get_redis().mget(*[f"poll:{poll_id}" for poll_id, _ in page])
     # redis_client.mget(poll_id_1, poll_id_2, poll_id_3, ...)
 
-    polls = [Poll.model_validate_json(pj) for pj in poll_jsons if pj]
+    # A poll deleted between the two calls comes back as None, like an
+    # archived one unless the archive has it
+    stored_polls = []
+    for (poll_id, _), pj in zip(page, poll_jsons, strict=True):
+        if not pj and (archived := get_archived_poll(UUID(poll_id))):
+            pj = archived.poll_record
+        if pj:
+            stored_polls.append(str(pj))
+    polls = [decode_poll(stored) for stored in stored_polls]
+    await migrate_stored_polls(
+        [
+            p
+            for p, stored in zip(polls, stored_polls, strict=True)
+            if not is_current(stored)
+        ]
+    )
+    return polls, next_cursor
 
-    return polls
 
+async def get_all_polls(
+    limit: int, after: PageCursor | None = None
+) -> tuple[list[Poll], PageCursor | None]:
+    """All polls, oldest first"""
+    return await _get_polls_page(POLLS_BY_CREATED, -inf, inf, limit, after)
 
-def save_poll(poll: Poll) -> None:
-    poll_json = poll.model_dump_json()
-    redis_client.set(f"poll:{poll.id}", poll_json)
 
+async def get_active_polls(
+    limit: int, after: PageCursor | None = None
+) -> tuple[list[Poll], PageCursor | None]:
+    """Polls that are still open, the ones closing soonest first"""
+    now = datetime.now(UTC).timestamp()
+    return await _get_polls_page(
+        POLLS_BY_EXPIRES, now, inf, limit, after, min_exclusive=True
+    )
+
+
+async def get_expired_polls(
+    limit: int, after: PageCursor | None = None
+) -> tuple[list[Poll], PageCursor | None]:
+    """Closed polls, in the order they expired"""
+    now = datetime.now(UTC).timestamp()
+    return await _get_polls_page(POLLS_BY_EXPIRES, -inf, now, limit, after)
+
+
+async def count_polls() -> int:
+    return await get_redis().zcard(POLLS_BY_CREATED)
+
+
+async def index_polls(polls: list[Poll]) -> None:
+    """Add already stored polls to the listing indexes"""
+    if not polls:
+        return
+
+    pipeline = get_redis().pipeline()
+    for poll in polls:
+        _index_poll(pipeline, poll)
+    await pipeline.exec()
+
+
+async def save_poll(poll: Poll) -> None:
+    poll_json = encode_poll(poll)
+    # Cache and index the poll as readers will decode it
+    stored_poll = decode_poll(poll_json)
+
+    empty_results = PollResults(
+        id=poll.id,
+        title=poll.title,
+        total_votes=0,
+        results=[Result(description=c.description, vote_count=0) for c in poll.options],
+    )
+
+    transaction = get_redis().multi()
+    transaction.set(f"poll:{poll.id}", poll_json)
+    transaction.set(f"poll_results:{poll.id}", empty_results.model_dump_json())
+    _index_poll(transaction, stored_poll)
+    await transaction.exec()
+
+    if poll_cache is not None:
+        poll_cache.set(poll.id, stored_poll)
+
+
+async def migrate_stored_polls(polls: list[Poll]) -> None:
+    """Rewrite the records of polls that were read in a legacy format"""
+    if not polls:
+        return
+
+    pipeline = get_redis().pipeline()
+    for poll in polls:
+        # XX: never bring back a poll deleted in the meantime
+        pipeline.set(f"poll:{poll.id}", encode_poll(poll), xx=True)
+    await pipeline.exec()
 
-def get_poll(poll_id: UUID) -> Poll | None:
-    poll_json = redis_client.get(f"poll:{poll_id}")
-    if poll_json:
-        return Poll.model_validate_json(poll_json)
-    return None
 
+async def get_poll(poll_id: UUID) -> Poll | None:
+    if poll_cache is not None and (poll := poll_cache.get(poll_id)) is not None:
+        return poll
 
-def get_choice_id_by_label(poll_id: UUID, label: int) -> UUID | None:
-    poll = get_poll(poll_id)
+    poll_json = await loader.read(get_redis(), ["GET", f"poll:{poll_id}"])
+    if not poll_json and (archived := get_archived_poll(poll_id)):
+        poll_json = archived.poll_record
+    if not poll_json:
+        return None
+
+    poll = decode_poll(poll_json)
+    if not is_current(poll_json):
+        await migrate_stored_polls([poll])
+    if poll_cache is not None:
+        poll_cache.set(poll_id, poll)
+    return poll
+
+
+async def get_poll_with_json(poll_id: UUID) -> tuple[Poll, str] | None:
+    """
+    The poll, and the poll rendered for GET /polls/{poll_id}: exactly what
+    FastAPI would make of the Poll, kept so repeated reads skip the
+    serialization. The record is decoded once either way.
+    """
+    poll = await get_poll(poll_id)
+    if poll is None:
+        return None
+    if (
+        poll_json_cache is not None
+        and (poll_json := poll_json_cache.get(poll_id)) is not None
+    ):
+        return poll, poll_json
+
+    poll_json = poll.model_dump_json()
+    if poll_json_cache is not None:
+        poll_json_cache.set(poll_id, poll_json)
+    return poll, poll_json
+
+
+async def get_choice_id_by_label(poll_id: UUID, label: int) -> UUID | None:
+    poll = await get_poll(poll_id)
     if not poll:
         return None
     return get_choice_id_by_label_given(poll, label)
@@ -61,33 +318,145 @@ def get_choice_id_by_label_given(poll: Poll, label: int) -> UUID | None:
     return None
 
 
-def get_vote(poll_id: UUID, email: str) -> Vote | None:
-    vote_json = redis_client.hget(f"votes:{poll_id}", email)
+async def get_vote(poll_id: UUID, email: str) -> Vote | None:
+    stored, poll = await asyncio.gather(
+        loader.read(get_redis(), ["HGET", f"votes:{poll_id}", email]),
+        get_poll(poll_id),
+    )
+    if not stored or poll is None:
+        return None
+    return decode_vote(poll, email, stored)
 
-    if vote_json:
-        return Vote.model_validate_json(vote_json)
 
-    return None
+async def has_voted(poll_id: UUID, email: str) -> bool:
+    """Existence probe, nothing is transferred or parsed"""
+    return bool(await loader.read(get_redis(), ["HEXISTS", f"votes:{poll_id}", email]))
+
+
+class VoteStatus(Enum):
+    RECORDED = "recorded"
+    ALREADY_VOTED = "already_voted"
+    # Deleted or archived since it was read, possibly from a stale cache
+    POLL_NOT_FOUND = "poll_not_found"
+
+
+_VOTE_STATUSES = {
+    1: VoteStatus.RECORDED,
+    0: VoteStatus.ALREADY_VOTED,
+    -1: VoteStatus.POLL_NOT_FOUND,
+}
+
+
+def _results_template(poll: Poll) -> list[str]:
+    """The parts of the results document COMMIT_VOTE cannot know by itself"""
+    head = f'{{"id":{to_json(str(poll.id)).decode()},"title":{to_json(poll.title).decode()}'
+    template = [head]
+    for choice in poll.options:
+        template += [str(choice.id), to_json(choice.description).decode()]
+    return template
+
+
+def timeline_keys(poll: Poll) -> list[str]:
+    """The poll's timeline hashes still alive, to drop along with the poll"""
+    if vote_timeline is None:
+        return []
+    return vote_timeline.poll_keys(poll.id, poll.created_at, datetime.now(UTC))
 
 
-def save_vote(poll_id: UUID, vote: Vote) -> None:
-    vote_json = vote.model_dump_json()
-    redis_client.hset(f"votes:{poll_id}", vote.voter.email, vote_json)
-    redis_client.hincrby(f"votes_count:{poll_id}", str(vote.choice_id), 1)
+def _commit_vote_keys(poll_id: UUID, vote: Vote) -> list[str]:
+    keys = [
+        f"votes:{poll_id}",
+        f"votes_count:{poll_id}",
+        f"poll_results:{poll_id}",
+        f"poll:{poll_id}",
+    ]
+    if vote_timeline is not None:
+        keys += vote_timeline.commit_keys(poll_id, vote.voter.voted_at)
+    return keys
+
+
+def _commit_vote_args(poll: Poll, vote: Vote, results_template: list[str]) -> list[str]:
+    timeline_args = ["", "", "", ""]
+    if vote_timeline is not None:
+        label = next(c.label for c in poll.options if c.id == vote.choice_id)
+        timeline_args = vote_timeline.commit_args(label, vote.voter.voted_at)
+    return [
+        vote.voter.email,
+        encode_vote(poll, vote, settings.VOTE_ENCODING),
+        str(vote.choice_id),
+        *timeline_args,
+        *results_template,
+    ]
 
 
-def get_vote_count(poll_id: UUID) -> dict[UUID, int]:
-    vote_counts = redis_client.hgetall(f"votes_count:{poll_id}")
+async def save_vote(poll: Poll, vote: Vote) -> VoteStatus:
+    """
+    Record the vote, bump its choice counter and refresh the poll's results
+    document in one atomic round trip. The voter check happens inside the
+    script, so two concurrent votes from the same email can never both be
+    counted, and so is the poll's existence: a vote for a poll deleted by
+    another process (still in this one's cache) is not written.
+    """
+    status = _VOTE_STATUSES[
+        await COMMIT_VOTE(
+            get_redis(),
+            keys=_commit_vote_keys(poll.id, vote),
+            args=_commit_vote_args(poll, vote, _results_template(poll)),
+        )
+    ]
+    if status == VoteStatus.POLL_NOT_FOUND:
+        forget_poll(poll.id)
+    return status
+
+
+BULK_CHUNK_SIZE = 500
+
+
+async def save_votes(poll: Poll, votes: list[Vote]) -> list[VoteStatus]:
+    """
+    save_vote for many votes of one poll, sent as pipelines of
+    BULK_CHUNK_SIZE script calls. Each vote is still committed atomically.
+    """
+    if not votes:
+        return []
+
+    await COMMIT_VOTE.load(get_redis())
+    results_template = _results_template(poll)
+
+    statuses = []
+    for start in range(0, len(votes), BULK_CHUNK_SIZE):
+        pipeline = get_redis().pipeline()
+        for vote in votes[start : start + BULK_CHUNK_SIZE]:
+            COMMIT_VOTE.queue(
+                pipeline,
+                _commit_vote_keys(poll.id, vote),
+                _commit_vote_args(poll, vote, results_template),
+            )
+        statuses += [_VOTE_STATUSES[status] for status in await pipeline.exec()]
+    if VoteStatus.POLL_NOT_FOUND in statuses:
+        forget_poll(poll.id)
+    return statuses
+
+
+async def get_vote_count(poll_id: UUID) -> dict[UUID, int]:
+    vote_counts: dict[str, str] = await loader.read(
+        get_redis(), ["HGETALL", f"votes_count:{poll_id}"]
+    )
 
     return {UUID(choice_id): int(count) for choice_id, count in vote_counts.items()}
 
 
-def get_poll_results(poll_id: UUID) -> PollResults | None:
-    poll = get_poll(poll_id)
+async def get_poll_results(poll_id: UUID) -> PollResults | None:
+    poll, vote_counts = await asyncio.gather(get_poll(poll_id), get_vote_count(poll_id))
     if not poll:
         return None
+    if not vote_counts and (archived := get_archived_poll(poll_id)):
+        return PollResults.model_validate_json(archived.results_json)
 
-    vote_counts = get_vote_count(poll_id)
+    return _build_poll_results(poll, vote_counts)
+
+
+def _build_poll_results(poll: Poll, vote_counts: dict[UUID, int]) -> PollResults:
     total_votes = sum(vote_counts.values())
 
     results = [
@@ -102,11 +471,115 @@ def get_poll_results(poll_id: UUID) -> PollResults | None:
     )
 
 
-def delete_poll(poll_id: UUID) -> None:
-    # redis_client(f"poll:{poll_id}")
-    # redis_client(f"votes:{poll_id}")
-    # redis_client(f"votes_count:{poll_id}")
-
-    keys_to_delete = [f"poll:{poll_id}", f"votes:{poll_id}", f"votes_count:{poll_id}"]
+async def get_poll_results_json(poll_id: UUID) -> str | None:
+    """
+    The poll's results as ready-to-send JSON, kept up to date by every vote.
+    Polls created before results were materialized get their document built
+    on first read.
+    """
+    results_json = await loader.read(get_redis(), ["GET", f"poll_results:{poll_id}"])
+    if results_json:
+        return str(results_json)
+    if archived := get_archived_poll(poll_id):
+        return archived.results_json
+
+    results = await get_poll_results(poll_id)
+    if results is None:
+        return None
 
-    redis_client.delete(*keys_to_delete)
+    stored = await STORE_POLL_RESULTS(
+        get_redis(),
+        keys=_store_results_keys(poll_id),
+        args=[results.model_dump_json()],
+    )
+    if stored is None:
+        # Deleted or archived behind this process' cached copy of the poll
+        forget_poll(poll_id)
+        return None
+    return str(stored)
+
+
+def _store_results_keys(poll_id: UUID) -> list[str]:
+    return [f"poll:{poll_id}", f"poll_results:{poll_id}"]
+
+
+async def get_many_poll_results_json(poll_ids: list[UUID]) -> dict[UUID, str]:
+    """
+    get_poll_results_json for many polls: one MGET of the results documents,
+    and only for polls that have none yet, one MGET of the polls, one
+    pipeline of HGETALLs and one pipeline storing the built documents.
+    Polls that do not exist are left out.
+    """
+    if not poll_ids:
+        return {}
+
+    stored = await get_redis().mget(*[f"poll_results:{pid}" for pid in poll_ids])
+    found = {pid: str(doc) for pid, doc in zip(poll_ids, stored, strict=True) if doc}
+    for pid in poll_ids:
+        if pid not in found and (archived := get_archived_poll(pid)):
+            found[pid] = archived.results_json
+    misses = [pid for pid in poll_ids if pid not in found]
+    if not misses:
+        return found
+
+    poll_jsons = await get_redis().mget(*[f"poll:{pid}" for pid in misses])
+    polls = [decode_poll(pj) for pj in poll_jsons if pj]
+    if not polls:
+        return found
+
+    pipeline = get_redis().pipeline()
+    for poll in polls:
+        pipeline.hgetall(f"votes_count:{poll.id}")
+    all_counts = cast(list[dict[str, str]], await pipeline.exec())
+
+    await STORE_POLL_RESULTS.load(get_redis())
+    pipeline = get_redis().pipeline()
+    for poll, vote_counts in zip(polls, all_counts, strict=True):
+        counts = {UUID(choice_id): int(n) for choice_id, n in vote_counts.items()}
+        STORE_POLL_RESULTS.queue(
+            pipeline,
+            _store_results_keys(poll.id),
+            [_build_poll_results(poll, counts).model_dump_json()],
+        )
+    for poll, results_json in zip(polls, await pipeline.exec(), strict=True):
+        # None: deleted since the MGET
+        if results_json is not None:
+            found[poll.id] = str(results_json)
+    return found
+
+
+async def delete_poll(poll_id: UUID) -> int:
+    """
+    Remove the poll from every read at once. Returns how many of its votes
+    are left for poll_deletion.purge_votes to reclaim in batches.
+    """
+    poll = await get_poll(poll_id)
+    keys = [
+        f"poll:{poll_id}",
+        f"votes_count:{poll_id}",
+        f"poll_results:{poll_id}",
+        POLLS_BY_CREATED,
+        POLLS_BY_EXPIRES,
+        f"votes:{poll_id}",
+        deleted_votes_key(poll_id),
+        POLLS_DELETING,
+        deletion_progress_key(poll_id),
+        POLLS_TO_ARCHIVE,
+    ]
+    if poll is not None:
+        keys += timeline_keys(poll)
+    now_ms = int(datetime.now(UTC).timestamp() * 1000)
+    args = [str(poll_id), str(now_ms), str(settings.POLL_DELETE_BATCH_SIZE)]
+    left = int(await DELETE_POLL(get_redis(), keys, args))
+    if poll_archive is not None:
+        poll_archive.remove(poll_id)
+    forget_poll(poll_id)
+    return left
+
+
+def forget_poll(poll_id: UUID) -> None:
+    """Drop the poll from this process' caches"""
+    if poll_cache is not None:
+        poll_cache.invalidate(poll_id)
+    if poll_json_cache is not None:
+        poll_json_cache.invalidate(poll_id)
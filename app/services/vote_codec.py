@@ -0,0 +1,46 @@
+"""
+How a vote is stored as the value of votes:{poll_id}[email].
+
+"json" is the full Vote document (~190 bytes). "compact" keeps only what the
+key does not already say: "<choice label>:<epoch seconds>", e.g.
+"2:1792341847", ~12 bytes. The REST client hands values back as UTF-8 text,
+so the compact form stays printable instead of packing raw bytes. voted_at
+keeps whole seconds.
+
+Both forms can live side by side in one hash: decode_vote tells them apart
+by the leading "{".
+"""
+
+from datetime import datetime
+from typing import Literal
+
+from app.models.Polls import Poll
+from app.models.Votes import Vote, Voter
+
+VoteEncoding = Literal["json", "compact"]
+
+
+def encode_vote(poll: Poll, vote: Vote, encoding: VoteEncoding) -> str:
+    if encoding == "compact":
+        for choice in poll.options:
+            if choice.id == vote.choice_id:
+                return f"{choice.label}:{int(vote.voter.voted_at.timestamp())}"
+    return vote.model_dump_json()
+
+
+def decode_vote(poll: Poll, email: str, stored: str) -> Vote | None:
+    """The Vote behind a stored value, None if it names no option of the poll"""
+    if stored.startswith("{"):
+        return Vote.model_validate_json(stored)
+
+    label, _, voted_at = stored.partition(":")
+    for choice in poll.options:
+        if choice.label == int(label):
+            # Already validated when the vote was cast
+            voter = Voter.model_construct(
+                email=email, voted_at=datetime.fromtimestamp(int(voted_at))
+            )
+            return Vote.model_construct(
+                poll_id=poll.id, choice_id=choice.id, voter=voter
+            )
+    return None
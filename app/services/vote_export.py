@@ -0,0 +1,130 @@
+"""
+Streaming export of a poll's votes, for audits. Votes are read in batches of
+BATCH_SIZE with HSCAN (from the archive file for archived polls) and
+rendered as NDJSON or CSV as they arrive, so memory stays flat whatever the
+size of the poll and Redis only ever runs short commands.
+
+The last row of every batch carries the cursor that resumes the export
+right after it, "0" on the very last row. Cursors of archived polls start
+with "a". HSCAN may return a vote twice when the hash is resized during the
+export, which only writes can cause: dedupe by email if the poll is open.
+"""
+
+import csv
+import io
+from collections.abc import AsyncIterator
+from enum import Enum
+from itertools import islice
+from typing import Any
+from uuid import UUID
+
+from pydantic_core import to_json
+
+from app.models.Polls import Poll
+from app.models.Votes import Vote
+from app.services import utils
+from app.services.vote_codec import decode_vote
+
+BATCH_SIZE = 500
+
+CSV_HEADER = ["email", "choice_id", "choice_label", "choice", "voted_at", "cursor"]
+
+
+class ExportFormat(Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def check_cursor(poll_id: UUID, cursor: str) -> None:
+    """Raise ValueError for a cursor this poll's export cannot resume from"""
+    archived = utils.get_archived_poll(poll_id) is not None
+    if cursor.startswith("a") != archived or not cursor.removeprefix("a").isdigit():
+        raise ValueError(cursor)
+
+
+async def _hot_batches(
+    poll: Poll, cursor: str
+) -> AsyncIterator[tuple[list[Vote], str]]:
+    position = int(cursor)
+    held: list[Vote] = []
+    held_cursor = cursor
+    while True:
+        position, stored = await utils.get_redis().hscan(
+            f"votes:{poll.id}", position, count=BATCH_SIZE
+        )
+        votes = [decode_vote(poll, email, v) for email, v in stored.items()]
+        batch = [vote for vote in votes if vote is not None]
+        # A batch is only sent once the next non-empty one is in, so the
+        # last one is known to be the last
+        if batch:
+            if held:
+                yield held, held_cursor
+            held = batch
+        held_cursor = str(position)
+        if position == 0:
+            if held:
+                yield held, "0"
+            return
+
+
+async def _archived_batches(
+    poll: Poll, cursor: str
+) -> AsyncIterator[tuple[list[Vote], str]]:
+    assert utils.poll_archive is not None
+    offset = int(cursor.removeprefix("a"))
+    votes = islice(utils.poll_archive.read_votes(poll.id), offset, None)
+    batch = list(islice(votes, BATCH_SIZE))
+    while batch:
+        offset += len(batch)
+        following = list(islice(votes, BATCH_SIZE))
+        yield batch, f"a{offset}" if following else "0"
+        batch = following
+
+
+def _rows(poll: Poll, votes: list[Vote], cursor: str) -> list[list[Any]]:
+    choices = {choice.id: choice for choice in poll.options}
+    rows = []
+    for vote in votes:
+        # A vote for a choice the poll no longer has is still exported
+        choice = choices.get(vote.choice_id)
+        rows.append(
+            [
+                vote.voter.email,
+                str(vote.choice_id),
+                choice and choice.label,
+                choice and choice.description,
+                vote.voter.voted_at.isoformat(),
+                None,
+            ]
+        )
+    rows[-1][-1] = cursor
+    return rows
+
+
+async def export_votes(
+    poll: Poll, export_format: ExportFormat, cursor: str = ""
+) -> AsyncIterator[str]:
+    """The export as text chunks, one per batch (see check_cursor first)"""
+    archived = utils.get_archived_poll(poll.id) is not None
+    if export_format == ExportFormat.CSV and not cursor:
+        yield ",".join(CSV_HEADER) + "\r\n"
+
+    batches = (
+        _archived_batches(poll, cursor or "a0")
+        if archived
+        else _hot_batches(poll, cursor or "0")
+    )
+    async for votes, next_cursor in batches:
+        rows = _rows(poll, votes, next_cursor)
+        if export_format == ExportFormat.CSV:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            lines = []
+            for row in rows:
+                record = dict(zip(CSV_HEADER, row, strict=True))
+                if record["cursor"] is None:
+                    del record["cursor"]
+                lines.append(to_json(record).decode())
+            yield "\n".join(lines) + "\n"
@@ -0,0 +1,254 @@
+"""
+Optional write-behind queue for votes. With VOTE_QUEUE_ENABLED the vote
+endpoints only append the vote to a Redis Stream; workers in a consumer group
+(python -m app.commands.vote_worker) drain it in batches through
+utils.save_votes, so dedupe and counting work exactly as for a direct vote.
+
+Entries are acknowledged and deleted once applied, so the stream only ever
+holds votes that are not counted yet. An entry whose batch failed stays
+pending and is claimed again after VOTE_QUEUE_RETRY_IDLE_MS; after
+VOTE_QUEUE_MAX_DELIVERIES attempts it is moved to the dead-letter stream.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from typing import Any, cast
+from uuid import UUID
+
+from pydantic import BaseModel, ValidationError
+from upstash_redis.errors import UpstashError
+
+from app.models.Votes import Vote
+from app.services import utils
+
+logger = logging.getLogger(__name__)
+
+settings = utils.settings
+STREAM = settings.VOTE_QUEUE_STREAM
+GROUP = settings.VOTE_QUEUE_GROUP
+DEAD_LETTER_STREAM = f"{STREAM}:dead"
+
+# (entry id, vote json) as read from the stream
+Entry = tuple[str, str | None]
+
+
+class BatchOutcome(BaseModel):
+    recorded: int = 0
+    duplicate: int = 0
+    dropped: int = 0
+    failed: int = 0
+    dead_lettered: int = 0
+
+
+class QueueStats(BaseModel):
+    length: int
+    pending: int
+    undelivered: int
+    oldest_entry_age_seconds: float | None
+    consumers: dict[str, int]
+    dead_letters: int
+
+
+async def enqueue_vote(vote: Vote) -> str:
+    return str(
+        await utils.get_redis().execute(
+            ["XADD", STREAM, "*", "vote", vote.model_dump_json()]
+        )
+    )
+
+
+async def ensure_group() -> None:
+    """Create the consumer group, reading the stream from its first entry"""
+    try:
+        await utils.get_redis().execute(
+            ["XGROUP", "CREATE", STREAM, GROUP, "0", "MKSTREAM"]
+        )
+    except UpstashError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _parse_entries(raw: Any) -> list[Entry]:
+    entries: list[Entry] = []
+    for entry_id, fields in raw or []:
+        values = dict(zip(fields[::2], fields[1::2], strict=True)) if fields else {}
+        entries.append((entry_id, values.get("vote")))
+    return entries
+
+
+async def read_new(consumer: str, count: int) -> list[Entry]:
+    response = await utils.get_redis().execute(
+        ["XREADGROUP", "GROUP", GROUP, consumer, "COUNT", str(count)]
+        + ["STREAMS", STREAM, ">"]
+    )
+    if not response:
+        return []
+    _, raw = cast(list[list[Any]], response)[0]
+    return _parse_entries(raw)
+
+
+async def claim_stale(consumer: str, count: int) -> tuple[list[Entry], list[Entry]]:
+    """
+    Take over entries another delivery left unacknowledged for longer than
+    VOTE_QUEUE_RETRY_IDLE_MS. Returns the ones to retry and the ones that
+    ran out of attempts.
+    """
+    min_idle = settings.VOTE_QUEUE_RETRY_IDLE_MS
+    pending = cast(
+        list[list[Any]],
+        await utils.get_redis().execute(
+            ["XPENDING", STREAM, GROUP, "-", "+", str(count)]
+        ),
+    )
+    deliveries = {
+        entry_id: int(times)
+        for entry_id, _, idle, times in pending
+        if int(idle) >= min_idle
+    }
+    if not deliveries:
+        return [], []
+
+    claimed = _parse_entries(
+        await utils.get_redis().execute(
+            ["XCLAIM", STREAM, GROUP, consumer, str(min_idle), *deliveries]
+        )
+    )
+    retry = [
+        e for e in claimed if deliveries[e[0]] < settings.VOTE_QUEUE_MAX_DELIVERIES
+    ]
+    dead = [
+        e for e in claimed if deliveries[e[0]] >= settings.VOTE_QUEUE_MAX_DELIVERIES
+    ]
+    return retry, dead
+
+
+async def _ack(entry_ids: list[str]) -> None:
+    if not entry_ids:
+        return
+    pipeline = utils.get_redis().pipeline()
+    pipeline.execute(["XACK", STREAM, GROUP, *entry_ids])
+    pipeline.execute(["XDEL", STREAM, *entry_ids])
+    await pipeline.exec()
+
+
+async def dead_letter(entries: list[Entry], reason: str) -> None:
+    if not entries:
+        return
+    pipeline = utils.get_redis().pipeline()
+    for entry_id, vote_json in entries:
+        pipeline.execute(
+            ["XADD", DEAD_LETTER_STREAM, "*", "entry_id", entry_id]
+            + ["vote", vote_json or "", "reason", reason]
+        )
+    await pipeline.exec()
+    await _ack([entry_id for entry_id, _ in entries])
+
+
+async def apply(entries: list[Entry]) -> BatchOutcome:
+    """
+    Commit a batch of queued votes, one save_votes pipeline per poll.
+    Entries of a poll whose commit fails are left pending for a retry.
+    """
+    outcome = BatchOutcome()
+    by_poll: defaultdict[UUID, list[tuple[str, Vote]]] = defaultdict(list)
+    malformed: list[Entry] = []
+    for entry_id, vote_json in entries:
+        try:
+            vote = Vote.model_validate_json(vote_json or "")
+        except ValidationError:
+            malformed.append((entry_id, vote_json))
+            continue
+        by_poll[vote.poll_id].append((entry_id, vote))
+
+    await dead_letter(malformed, "malformed")
+    outcome.dead_lettered += len(malformed)
+
+    done: list[str] = []
+    for poll_id, queued in by_poll.items():
+        entry_ids = [entry_id for entry_id, _ in queued]
+        try:
+            poll = await utils.get_poll(poll_id)
+            if poll is None or utils.get_archived_poll(poll_id):
+                # The poll was deleted (or archived, its results final)
+                # after the vote was accepted
+                outcome.dropped += len(queued)
+                done += entry_ids
+                continue
+            statuses = await utils.save_votes(poll, [vote for _, vote in queued])
+        except Exception:
+            logger.exception("Committing %d queued votes failed", len(queued))
+            outcome.failed += len(queued)
+            continue
+
+        recorded = statuses.count(utils.VoteStatus.RECORDED)
+        # The poll was read from this process' cache and is gone since
+        dropped = statuses.count(utils.VoteStatus.POLL_NOT_FOUND)
+        outcome.recorded += recorded
+        outcome.dropped += dropped
+        outcome.duplicate += len(statuses) - recorded - dropped
+        done += entry_ids
+
+    await _ack(done)
+    return outcome
+
+
+async def get_queue_stats() -> QueueStats:
+    pipeline = utils.get_redis().pipeline()
+    pipeline.execute(["XLEN", STREAM])
+    pipeline.execute(["XLEN", DEAD_LETTER_STREAM])
+    pipeline.execute(["XRANGE", STREAM, "-", "+", "COUNT", "1"])
+    length, dead_letters, oldest = cast(
+        tuple[int, int, list[Any]], await pipeline.exec()
+    )
+
+    try:
+        summary = cast(
+            list[Any], await utils.get_redis().execute(["XPENDING", STREAM, GROUP])
+        )
+        pending = int(summary[0])
+        consumers = {name: int(count) for name, count in summary[3] or []}
+    except UpstashError as e:
+        # No worker has created the group yet
+        if "NOGROUP" not in str(e):
+            raise
+        pending, consumers = 0, {}
+
+    oldest_age = None
+    if oldest:
+        created_ms = int(oldest[0][0].split("-")[0])
+        oldest_age = max(0.0, time.time() - created_ms / 1000)
+
+    # Acknowledged entries are deleted, so whatever is not pending in the
+    # group has not been handed to a worker yet
+    return QueueStats(
+        length=length,
+        pending=pending,
+        undelivered=max(0, length - pending),
+        oldest_entry_age_seconds=oldest_age,
+        consumers=consumers,
+        dead_letters=dead_letters,
+    )
+
+
+async def process_batch(
+    consumer: str, reclaim: bool = True
+) -> tuple[int, BatchOutcome]:
+    """
+    One worker step: retry stale entries when reclaim is set, top the batch
+    up with new ones and commit it. Returns how many entries were handled.
+    """
+    batch_size = settings.VOTE_QUEUE_BATCH_SIZE
+    retry: list[Entry] = []
+    dead: list[Entry] = []
+    if reclaim:
+        retry, dead = await claim_stale(consumer, batch_size)
+        await dead_letter(dead, "max_deliveries")
+
+    entries = retry
+    if len(entries) < batch_size:
+        entries += await read_new(consumer, batch_size - len(entries))
+
+    outcome = await apply(entries) if entries else BatchOutcome()
+    outcome.dead_lettered += len(dead)
+    return len(entries) + len(dead), outcome
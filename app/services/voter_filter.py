@@ -0,0 +1,102 @@
+"""
+In-process prefilter for the "already voted" check: a Bloom filter of the
+voter emails of each recently voted-on poll. A miss means the voter has
+definitely not voted (as far as this process knows), so the Redis probe is
+skipped; a hit still goes to Redis.
+
+A filter is rebuilt from votes:{poll_id} (HSCAN batches of BATCH_SIZE, so a
+huge poll never blocks Redis with one HKEYS) the first time a process sees
+the poll, and again every VOTER_FILTER_TTL_SECONDS to pick up votes recorded
+by other processes. A vote it misses in between is still rejected atomically
+when the vote is committed, it only loses the early 400.
+"""
+
+import asyncio
+from typing import Any
+from uuid import UUID
+
+from app.services import utils
+from app.services.bloom import BloomFilter
+from app.services.cache import TTLCache
+
+settings = utils.settings
+
+BATCH_SIZE = 1000
+
+filters: TTLCache[UUID, BloomFilter] | None = (
+    TTLCache(settings.VOTER_FILTER_MAX_POLLS, settings.VOTER_FILTER_TTL_SECONDS)
+    if settings.VOTER_FILTER_ENABLED
+    else None
+)
+# Filters being filled from Redis; voters recorded meanwhile go straight in
+_building: dict[UUID, tuple[BloomFilter, asyncio.Task[None]]] = {}
+probes_skipped = 0
+
+
+async def _fill(poll_id: UUID, bloom: BloomFilter) -> None:
+    assert filters is not None
+    try:
+        cursor = 0
+        while True:
+            cursor, votes = await utils.get_redis().hscan(
+                f"votes:{poll_id}", cursor, count=BATCH_SIZE
+            )
+            for email in votes:
+                bloom.add(email)
+            if cursor == 0:
+                break
+        filters.set(poll_id, bloom)
+    finally:
+        del _building[poll_id]
+
+
+async def _get_filter(poll_id: UUID) -> BloomFilter:
+    assert filters is not None
+    if (bloom := filters.get(poll_id)) is not None:
+        return bloom
+
+    if poll_id not in _building:
+        bloom = BloomFilter(
+            settings.VOTER_FILTER_CAPACITY, settings.VOTER_FILTER_ERROR_RATE
+        )
+        _building[poll_id] = (bloom, asyncio.create_task(_fill(poll_id, bloom)))
+    bloom, task = _building[poll_id]
+    # Shielded: a client going away must not abort the shared rebuild
+    await asyncio.shield(task)
+    return bloom
+
+
+async def might_have_voted(poll_id: UUID, email: str) -> bool:
+    """False only when the voter has certainly not voted yet"""
+    global probes_skipped
+    if filters is None:
+        return True
+    if email in await _get_filter(poll_id):
+        return True
+    probes_skipped += 1
+    return False
+
+
+def record_voter(poll_id: UUID, email: str) -> None:
+    if filters is None:
+        return
+    if poll_id in _building:
+        _building[poll_id][0].add(email)
+    elif (bloom := filters.get(poll_id)) is not None:
+        bloom.add(email)
+
+
+def stats() -> dict[str, Any]:
+    if filters is None:
+        return {"enabled": False}
+    loaded = filters.values()
+    return {
+        "enabled": True,
+        "capacity": settings.VOTER_FILTER_CAPACITY,
+        "error_rate": settings.VOTER_FILTER_ERROR_RATE,
+        "polls": len(loaded),
+        "voters": sum(bloom.count for bloom in loaded),
+        "memory_bytes": sum(bloom.nbytes for bloom in loaded),
+        "probes_skipped": probes_skipped,
+        **filters.stats(),
+    }
@@ -16,5 +16,6 @@ def localize_vn_datetime(dt: datetime | None) -> datetime | None:
 def format_vn_time(v: datetime | None) -> str | None:
     if v is None:
         return None
-    # vn_time = v.astimezone(VN_TZ)
-    return v.strftime("%d-%m-%Y %H:%M:%S")
+    vn_time = localize_vn_datetime(v)
+    assert vn_time is not None
+    return vn_time.strftime("%d-%m-%Y %H:%M:%S")
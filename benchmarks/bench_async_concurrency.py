@@ -0,0 +1,114 @@
+"""
+Concurrent requests per worker: blocking storage path vs the async one.
+
+Both variants serve GET /polls/{poll_id}/results (one GET + one HGETALL against
+Redis) from a single process, talking to the local Upstash stand-in with a
+simulated network round trip. The "sync" variant is the pre-async handler: a
+plain ``def`` endpoint on the blocking ``upstash_redis.Redis`` client, which
+FastAPI runs on its threadpool. The "async" variant is the real ``main.app``.
+
+Usage:
+    python -m benchmarks.bench_async_concurrency --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from uuid import UUID
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+def build_sync_app(standin: RedisStandIn) -> FastAPI:
+    from app.models.Results import PollResults, Result
+    from app.services.poll_codec import decode_poll
+
+    client = standin.client()
+    app = FastAPI()
+
+    @app.get("/polls/{poll_id}/results")
+    def get_results(poll_id: UUID) -> PollResults | None:
+        poll_json = client.get(f"poll:{poll_id}")
+        if not poll_json:
+            return None
+        poll = decode_poll(poll_json)
+        vote_counts = client.hgetall(f"votes_count:{poll_id}")
+        counts = {UUID(k): int(v) for k, v in vote_counts.items()}
+        results = sorted(
+            (
+                Result(description=c.description, vote_count=counts.get(c.id, 0))
+                for c in poll.options
+            ),
+            key=lambda x: x.vote_count,
+            reverse=True,
+        )
+        return PollResults(
+            id=poll.id,
+            title=poll.title,
+            total_votes=sum(counts.values()),
+            results=results,
+        )
+
+    return app
+
+
+async def drive(
+    app: FastAPI, standin: RedisStandIn, path: str, requests: int, concurrency: int
+) -> None:
+    standin.reset_counters()
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def one() -> None:
+            async with semaphore:
+                response = await c.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"  {requests} requests in {elapsed:.2f}s -> {requests / elapsed:,.0f} req/s, "
+        f"peak concurrent Redis round trips per worker: {standin.peak_in_flight}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.models.Polls import PollCreate
+    from app.services import utils
+    from main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    standin = RedisStandIn(latency=args.latency)
+    standin.attach(utils.get_redis())
+
+    poll = PollCreate(title="benchmark poll", options=["a", "b"], expires_at=None)
+    new_poll = poll.create_poll()
+    await utils.save_poll(new_poll)
+    path = f"/polls/{new_poll.id}/results"
+
+    print(f"simulated Redis round trip: {args.latency * 1000:.0f} ms")
+    print("sync (def + blocking client, threadpool):")
+    sync_app = build_sync_app(standin)
+    await drive(sync_app, standin, path, args.requests, args.concurrency)
+    print("async (async def + asyncio client):")
+    await drive(app, standin, path, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
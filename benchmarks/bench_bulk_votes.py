@@ -0,0 +1,85 @@
+"""
+Bulk vote ingestion throughput: POST /vote/{poll_id}/bulk vs one
+POST /vote/{poll_id}/label per vote, against the local Upstash stand-in.
+
+Usage:
+    python -m benchmarks.bench_bulk_votes --votes 20000 --batch 5000
+    python -m benchmarks.bench_bulk_votes --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import httpx
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+async def main(args: argparse.Namespace) -> None:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.services import utils
+    from main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    standin = RedisStandIn(latency=args.latency, redis_url=args.redis_url)
+    standin.attach(utils.get_redis())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def new_poll() -> str:
+            response = await c.post(
+                "/polls/create",
+                json={"title": "bulk benchmark", "options": ["a", "b", "c"]}
+                | {"expires_at": None},
+            )
+            return str(response.json()["poll_id"])
+
+        def vote(i: int) -> dict[str, object]:
+            return {"choice_label": i % 3 + 1, "voter": {"email": f"v{i}@example.com"}}
+
+        poll_id = await new_poll()
+        single = min(args.votes, 2000)
+        standin.reset_counters()
+        started = time.perf_counter()
+        for i in range(single):
+            await c.post(f"/vote/{poll_id}/label", json=vote(i))
+        elapsed = time.perf_counter() - started
+        print(
+            f"one request per vote: {single} votes in {elapsed:.2f}s -> "
+            f"{single / elapsed:,.0f} votes/s, {standin.requests} Redis round trips"
+        )
+
+        poll_id = await new_poll()
+        standin.reset_counters()
+        started = time.perf_counter()
+        for start in range(0, args.votes, args.batch):
+            stop = min(start + args.batch, args.votes)
+            body = "\n".join(json.dumps(vote(i)) for i in range(start, stop))
+            response = await c.post(
+                f"/vote/{poll_id}/bulk",
+                content=body,
+                headers={"content-type": "application/x-ndjson"},
+            )
+            assert response.json()["accepted"] == stop - start
+        elapsed = time.perf_counter() - started
+        print(
+            f"bulk NDJSON, {args.batch} per request: {args.votes} votes in "
+            f"{elapsed:.2f}s -> {args.votes / elapsed:,.0f} votes/s, "
+            f"{standin.requests} Redis round trips"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--votes", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.001)
+    parser.add_argument("--redis-url", help="real Redis behind the stand-in")
+    asyncio.run(main(parser.parse_args()))
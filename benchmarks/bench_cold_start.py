@@ -0,0 +1,143 @@
+"""
+Cold start: what a fresh serverless instance pays before its first response.
+
+Each run is a new interpreter (python -m benchmarks.bench_cold_start --child)
+that times, in order:
+
+- import_ms: `import main`, i.e. settings, routers, models and middleware;
+- driver_ms: building the storage driver, which the first request that
+  reaches Redis triggers;
+- first_request_ms: the first GET / (no Redis);
+- first_redis_request_ms: the first GET /polls/, against the local stand-in.
+
+cold_start_ms is import + driver + first Redis request. The stand-in itself
+(with a few seeded polls) is set up between the driver and the requests and
+is not counted. With
+--budget-ms the run exits with status 1 when the median cold start is over
+budget, so CI can catch regressions. --imports N lists the N slowest imports
+of main (python -X importtime).
+
+Usage:
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --budget-ms 1500
+    python -m benchmarks.bench_cold_start --imports 15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+URL = "http://standin"
+TOKEN = "standin"  # noqa: S105
+PHASES = ("import_ms", "driver_ms", "first_request_ms", "first_redis_request_ms")
+
+
+def child() -> None:
+    started = time.perf_counter()
+    import main
+
+    imported = time.perf_counter()
+    from app.services import utils
+
+    client = utils.get_redis()
+    built = time.perf_counter()
+
+    # Not part of a cold start
+    import httpx
+
+    from benchmarks.standin import RedisStandIn
+    from benchmarks.suite import seed_polls
+
+    standin = RedisStandIn()
+    standin.attach(client)
+    seed_polls(standin, 10)
+
+    async def first_requests() -> tuple[float, float]:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            before = time.perf_counter()
+            (await c.get("/")).raise_for_status()
+            between = time.perf_counter()
+            (await c.get("/polls/?limit=10")).raise_for_status()
+            return between - before, time.perf_counter() - between
+
+    first, first_redis = asyncio.run(first_requests())
+    timings = (imported - started, built - imported, first, first_redis)
+    print(json.dumps({k: v * 1000 for k, v in zip(PHASES, timings, strict=True)}))
+
+
+def child_env() -> dict[str, str]:
+    return os.environ | {
+        "UPSTASH_REDIS_URL": URL,
+        "UPSTASH_REDIS_TOKEN": TOKEN,
+        "REDIS_DRIVER": "rest",
+    }
+
+
+def run_once() -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_cold_start", "--child"],
+        env=child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    timings: dict[str, float] = json.loads(output.splitlines()[-1])
+    timings["cold_start_ms"] = (
+        timings["import_ms"] + timings["driver_ms"] + timings["first_redis_request_ms"]
+    )
+    return timings
+
+
+def print_slowest_imports(count: int) -> None:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows: list[tuple[int, int, str]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        rows.append((int(fields[1]), int(fields[0]), fields[2].rstrip()))
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative, own, name in sorted(rows, reverse=True)[:count]:
+        print(f"{cumulative / 1000:>13.1f} {own / 1000:>8.1f}  {name}")
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.imports:
+        print_slowest_imports(args.imports)
+        print()
+
+    runs = [run_once() for _ in range(args.runs)]
+    medians = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+    for phase, value in medians.items():
+        print(f"{phase:<24} {value:>8.1f}")
+
+    if args.budget_ms is not None and medians["cold_start_ms"] > args.budget_ms:
+        print(
+            f"cold start {medians['cold_start_ms']:.0f} ms is over the "
+            f"{args.budget_ms:.0f} ms budget"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--child"]:
+        child()
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="fail over this median")
+    parser.add_argument("--imports", type=int, default=0, metavar="N")
+    sys.exit(main(parser.parse_args()))
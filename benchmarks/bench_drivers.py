@@ -0,0 +1,147 @@
+"""
+Storage drivers side by side: REDIS_DRIVER=rest (Upstash REST over HTTP,
+answered by the local stand-in) vs REDIS_DRIVER=resp (native protocol through
+redis-py's connection pool), on the vote and results workloads.
+
+Both drivers run the same utils calls on their own poll, and the run fails
+unless the two polls end up with identical results. Without
+--redis-url both talk to in-process fakeredis, so the numbers compare the
+client-side cost of each protocol (HTTP + JSON + base64 vs RESP). With
+--redis-url the stand-in forwards to that server and the RESP driver connects
+to it directly.
+
+Usage:
+    python -m benchmarks.bench_drivers --votes 5000 --concurrency 20
+    python -m benchmarks.bench_drivers --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import fakeredis
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+async def measure(
+    label: str, count: int, concurrency: int, call: Callable[[int], Awaitable[Any]]
+) -> None:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    p99 = (
+        statistics.quantiles(latencies, n=100, method="inclusive")[98]
+        if len(latencies) > 1
+        else latencies[0]
+    )
+    print(
+        f"  {label:<24} {count / elapsed:>9,.0f} ops/s  "
+        f"p50 {statistics.median(latencies) * 1000:>6.2f} ms  "
+        f"p99 {p99 * 1000:>6.2f} ms"
+    )
+
+
+async def run_workloads(args: argparse.Namespace) -> str:
+    """Returns the poll's results document for the cross-driver check"""
+    from app.models.Polls import PollCreate
+    from app.models.Votes import Vote, Voter
+    from app.services import utils
+
+    poll = PollCreate(
+        title="driver benchmark", options=["a", "b", "c"], expires_at=None
+    ).create_poll()
+    await utils.save_poll(poll)
+
+    def vote(i: int) -> Vote:
+        return Vote(
+            poll_id=poll.id,
+            choice_id=poll.options[i % 3].id,
+            voter=Voter(email=f"v{i}@example.com"),
+        )
+
+    n, concurrency = args.votes, args.concurrency
+    await measure("save_vote", n, concurrency, lambda i: utils.save_vote(poll, vote(i)))
+    await measure(
+        "save_vote (duplicate)",
+        n,
+        concurrency,
+        lambda i: utils.save_vote(poll, vote(i)),
+    )
+    batches = [
+        [vote(n + i) for i in range(start, start + 500)] for start in range(0, n, 500)
+    ]
+    await measure(
+        "save_votes (500/batch)",
+        len(batches),
+        1,
+        lambda i: utils.save_votes(poll, batches[i]),
+    )
+    await measure(
+        "get_poll_results_json",
+        n,
+        concurrency,
+        lambda _: utils.get_poll_results_json(poll.id),
+    )
+    await measure(
+        "get_poll_results", n, concurrency, lambda _: utils.get_poll_results(poll.id)
+    )
+    return str(await utils.get_poll_results_json(poll.id))
+
+
+async def main(args: argparse.Namespace) -> None:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.services import utils
+    from app.services.resp_driver import RespDriver
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rest = utils.get_redis()
+    RedisStandIn(redis_url=args.redis_url).attach(rest)
+    resp = (
+        RespDriver.from_url(
+            args.redis_url, args.pool_size, pool_timeout=5.0, instrumented=False
+        )
+        if args.redis_url
+        else RespDriver(
+            fakeredis.FakeAsyncRedis(
+                server=fakeredis.FakeServer(), decode_responses=True, protocol=2
+            ),
+            instrumented=False,
+        )
+    )
+
+    results = {}
+    for name, driver in (("rest", rest), ("resp", resp)):
+        print(f"REDIS_DRIVER={name}")
+        utils._redis_client = driver
+        results[name] = await run_workloads(args)
+
+    # The poll ids differ, the counts and the layout must not
+    rest_counts, resp_counts = (r.split('"results":')[1] for r in results.values())
+    assert rest_counts == resp_counts, (rest_counts, resp_counts)
+    print(f"results identical: {rest_counts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--votes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--redis-url", help="real Redis for both drivers")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""
+Per-request CPU of GET /polls/{poll_id}: the previous handler, which returned
+a Poll for FastAPI to serialize, vs the current one, which serves the poll's
+rendered JSON (cached next to the parsed poll).
+
+Both handlers run alone in a bare FastAPI app, without the middlewares of
+main.py, in the same process against the local Upstash stand-in, with the
+poll cache on (no Redis call) and off (one GET per request). The
+bodies of both handlers are compared byte for byte first. The cost of
+decoding one stored poll is reported for each storage format too.
+
+Usage:
+    python -m benchmarks.bench_get_poll --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+def build_reparse_app() -> FastAPI:
+    from app.models.Polls import Poll
+    from app.services import utils
+
+    app = FastAPI()
+
+    @app.get("/polls/{poll_id}")
+    async def get_poll(poll_id: UUID) -> Poll:
+        poll = await utils.get_poll(poll_id)
+        if not poll:
+            raise HTTPException(status_code=400, detail="A poll id not correct")
+        return poll
+
+    return app
+
+
+def build_current_app() -> FastAPI:
+    from app.api import polls
+
+    app = FastAPI()
+    app.include_router(polls.router, prefix="/polls")
+    return app
+
+
+async def cpu_per_request(app: FastAPI, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        started = time.process_time()
+        for _ in range(requests):
+            response = await c.get(path)
+            response.raise_for_status()
+        return (time.process_time() - started) / requests
+
+
+async def main(args: argparse.Namespace) -> None:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.models.Polls import PollCreate
+    from app.services import utils
+    from app.services.poll_codec import decode_poll, encode_poll
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    RedisStandIn().attach(utils.get_redis())
+    reparse_app = build_reparse_app()
+    app = build_current_app()
+
+    tomorrow = datetime.now(UTC) + timedelta(days=1)
+    polls = [
+        PollCreate(
+            title="Bữa trưa ăn gì? 🍜",
+            options=["Phở", "Bún chả", "Cơm tấm"],
+            expires_at=tomorrow,
+        ),
+        PollCreate(title="No expiry poll", options=["a", "b"], expires_at=None),
+        PollCreate(
+            title="Closes tomorrow",
+            options=["yes", "no", "maybe", "later", "never"],
+            expires_at=tomorrow,
+        ),
+    ]
+    paths = []
+    for poll_create in polls:
+        poll = poll_create.create_poll()
+        await utils.save_poll(poll)
+        paths.append(f"/polls/{poll.id}")
+
+    sample = await utils.get_poll(UUID(paths[-1].rsplit("/", 1)[1]))
+    assert sample is not None
+    for name, stored in (
+        ("legacy record", sample.model_dump_json()),
+        ("version 2 record", encode_poll(sample)),
+    ):
+        started = time.process_time()
+        for _ in range(args.requests):
+            decode_poll(stored)
+        cpu = (time.process_time() - started) / args.requests
+        print(f"decode {name:>16}: {cpu * 1e6:7.1f} us")
+
+    for cache in (True, False):
+        for path in paths:
+            async with (
+                httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app), base_url="http://b"
+                ) as new,
+                httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=reparse_app), base_url="http://b"
+                ) as old,
+            ):
+                assert (await new.get(path)).content == (await old.get(path)).content
+        print(f"poll cache {'on' if cache else 'off'}: bodies identical")
+
+        caches = utils.poll_cache, utils.poll_json_cache
+        if not cache:
+            utils.poll_cache = utils.poll_json_cache = None
+        for name, variant in (
+            ("previous handler", reparse_app),
+            ("current handler", app),
+        ):
+            cpu = await cpu_per_request(variant, paths[0], args.requests)
+            print(f"  {name:>17}: {cpu * 1e6:7.1f} us CPU/request")
+        utils.poll_cache, utils.poll_json_cache = caches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
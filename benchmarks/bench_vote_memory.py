@@ -0,0 +1,69 @@
+"""
+Redis memory per stored vote for each VOTE_ENCODING.
+
+fakeredis has no MEMORY USAGE, so against it only the payload (field plus
+value bytes) is reported; pass --redis-url to also get what the server
+really spends per vote, hash overhead included.
+
+Usage:
+    python -m benchmarks.bench_vote_memory --votes 100000
+    python -m benchmarks.bench_vote_memory --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+async def main(args: argparse.Namespace) -> None:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.models.Polls import PollCreate
+    from app.models.Votes import Vote, Voter
+    from app.services import utils
+
+    standin = RedisStandIn(redis_url=args.redis_url)
+    standin.attach(utils.get_redis())
+
+    for encoding in ("json", "compact"):
+        utils.settings.VOTE_ENCODING = encoding
+        poll = PollCreate(
+            title=f"memory {encoding}", options=["a", "b", "c"], expires_at=None
+        ).create_poll()
+        await utils.save_poll(poll)
+        votes = [
+            Vote(
+                poll_id=poll.id,
+                choice_id=poll.options[i % 3].id,
+                voter=Voter(email=f"voter{i}@example.com", voted_at=datetime.now()),
+            )
+            for i in range(args.votes)
+        ]
+        await utils.save_votes(poll, votes)
+
+        key = f"votes:{poll.id}"
+        payload = 0
+        cursor = 0
+        while True:
+            cursor, stored = await utils.get_redis().hscan(key, cursor, count=1000)
+            payload += sum(len(k) + len(v) for k, v in stored.items())
+            if cursor == 0:
+                break
+        line = f"{encoding:>7}: {payload / args.votes:6.1f} payload bytes/vote"
+
+        usage = standin.execute(["MEMORY", "USAGE", key, "SAMPLES", "0"])
+        if "result" in usage:
+            line += f", {usage['result'] / args.votes:6.1f} Redis bytes/vote"
+        print(line)
+        await utils.delete_poll(poll.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--votes", type=int, default=100_000)
+    parser.add_argument("--redis-url", help="real Redis behind the stand-in")
+    asyncio.run(main(parser.parse_args()))
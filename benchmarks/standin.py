@@ -0,0 +1,143 @@
+"""
+Local stand-in for the Upstash REST API, backed by an in-memory fakeredis server.
+
+It answers the same wire protocol as Upstash (``POST /`` for a single command,
+``POST /pipeline`` and ``POST /multi-exec`` for batches, base64 encoded
+results) through an in-process httpx transport, so both ``upstash_redis.Redis``
+and ``upstash_redis.asyncio.Redis`` run their real serialization code against
+it. A fixed ``latency`` is added to every HTTP round trip to emulate the
+network distance to a hosted instance: the blocking client sleeps its thread,
+the asyncio client yields to the event loop, exactly as on a real socket.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from base64 import b64encode
+from collections import Counter
+from typing import Any
+
+import fakeredis
+import httpx
+import redis
+from redis.exceptions import NoScriptError, ResponseError
+from upstash_redis import Redis
+from upstash_redis.asyncio import Redis as AsyncRedis
+
+from app.services.drivers import StorageDriver
+
+URL = "http://standin"
+TOKEN = "standin"  # noqa: S105
+
+
+class RedisStandIn:
+    """
+    Upstash REST stand-in. Commands run on fakeredis, or on a real Redis
+    server when ``redis_url`` is given (e.g. ``redis://localhost:6379/15``).
+    """
+
+    def __init__(self, latency: float = 0.0, redis_url: str | None = None) -> None:
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.commands: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._redis = (
+            redis.Redis.from_url(redis_url, protocol=2)
+            if redis_url
+            else fakeredis.FakeRedis(server=fakeredis.FakeServer(), protocol=2)
+        )
+        self._connection = self._redis.connection_pool.get_connection()
+
+    def execute(self, command: list[Any]) -> dict[str, Any]:
+        with self._lock:
+            self.commands[str(command[0]).upper()] += 1
+            self._connection.send_command(*[str(arg) for arg in command])  # type: ignore[no-untyped-call]
+            try:
+                return {"result": _encode(self._connection.read_response())}
+            except NoScriptError as e:
+                # redis-py strips the error code, Upstash passes it through
+                return {"error": f"NOSCRIPT {e}"}
+            except ResponseError as e:
+                return {"error": str(e)}
+
+    def load(self, commands: list[list[Any]]) -> None:
+        """Bulk-load data in one pipeline, bypassing the REST layer and counters"""
+        with self._lock:
+            pipeline = self._redis.pipeline(transaction=False)
+            for command in commands:
+                pipeline.execute_command(*command)  # type: ignore[no-untyped-call]
+            pipeline.execute()
+
+    def reset_counters(self) -> None:
+        self.requests = 0
+        self.peak_in_flight = 0
+        self.commands.clear()
+
+    def flush(self) -> None:
+        self.execute(["FLUSHDB"])
+        self.reset_counters()
+
+    def attach(self, client: Redis | AsyncRedis | StorageDriver) -> None:
+        """Point an upstash client at the stand-in instead of the network"""
+        if isinstance(client, AsyncRedis):
+            client._http._client = httpx.AsyncClient(
+                transport=httpx.MockTransport(self._handle_async)
+            )
+        elif isinstance(client, Redis):
+            client._http._client = httpx.Client(
+                transport=httpx.MockTransport(self._handle)
+            )
+        else:
+            raise TypeError("The stand-in only answers the REST driver")
+
+    def client(self) -> Redis:
+        client = Redis(url=URL, token=TOKEN, allow_telemetry=False)
+        self.attach(client)
+        return client
+
+    def async_client(self) -> AsyncRedis:
+        client = AsyncRedis(url=URL, token=TOKEN, allow_telemetry=False)
+        self.attach(client)
+        return client
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests += 1
+        body = json.loads(request.content)
+        if request.url.path == "/":
+            return httpx.Response(200, json=self.execute(body))
+        return httpx.Response(200, json=[self.execute(command) for command in body])
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self.in_flight += delta
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self._track(1)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return self._respond(request)
+        finally:
+            self._track(-1)
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        self._track(1)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self._respond(request)
+        finally:
+            self._track(-1)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return b64encode(value).decode()
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    return value
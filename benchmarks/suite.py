@@ -0,0 +1,286 @@
+"""
+Benchmark suite: the FastAPI app in-process against the local Upstash stand-in.
+
+Scenarios:
+- create_poll;
+- vote_by_id and vote_by_label on one poll;
+- get_poll_results and get_poll on a hot poll;
+- get_polls (all and active, first page of 50) with the store seeded to each
+  --polls size.
+
+Each scenario reports p50/p99 latency, throughput, and Redis round trips and
+commands per request. --save writes the numbers to a JSON file; --baseline
+compares against such a file and flags regressions beyond --threshold.
+
+Usage:
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --baseline baseline.json --fail-on-regression
+    python -m benchmarks.suite --polls 1000,100000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import httpx
+from pydantic import BaseModel
+
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+SEED_BATCH = 1000
+
+
+class ScenarioResult(BaseModel):
+    name: str
+    requests: int
+    p50_ms: float
+    p99_ms: float
+    throughput: float
+    round_trips_per_request: float
+    commands_per_request: float
+
+
+async def run_scenario(
+    name: str,
+    standin: RedisStandIn,
+    requests: int,
+    concurrency: int,
+    send: Callable[[int], Awaitable[httpx.Response]],
+) -> ScenarioResult:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    standin.reset_counters()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        p50_ms=percentiles[49] * 1000,
+        p99_ms=percentiles[98] * 1000,
+        throughput=requests / elapsed,
+        round_trips_per_request=standin.requests / requests,
+        commands_per_request=sum(standin.commands.values()) / requests,
+    )
+
+
+def seed_polls(standin: RedisStandIn, count: int) -> None:
+    """Write polls straight into the store, as save_poll would lay them out"""
+    from app.models.Polls import PollCreate
+    from app.models.Results import PollResults, Result
+    from app.services import utils
+    from app.services.poll_codec import encode_poll
+
+    now = datetime.now(UTC)
+    for start in range(0, count, SEED_BATCH):
+        documents: list[Any] = ["MSET"]
+        by_created: list[Any] = ["ZADD", utils.POLLS_BY_CREATED]
+        by_expires: list[Any] = ["ZADD", utils.POLLS_BY_EXPIRES]
+        for i in range(start, min(start + SEED_BATCH, count)):
+            # A third of the polls already closed, the rest still open
+            offset = timedelta(minutes=i + 1)
+            expires_at = now + offset if i % 3 else now - offset
+            poll = PollCreate(
+                title=f"seeded poll {i}", options=["a", "b", "c"], expires_at=None
+            ).create_poll()
+            poll.expires_at = expires_at
+            results = PollResults(
+                id=poll.id,
+                title=poll.title,
+                total_votes=0,
+                results=[
+                    Result(description=c.description, vote_count=0)
+                    for c in poll.options
+                ],
+            )
+            documents += [f"poll:{poll.id}", encode_poll(poll)]
+            documents += [f"poll_results:{poll.id}", results.model_dump_json()]
+            by_created += [poll.created_at.timestamp(), str(poll.id)]
+            by_expires += [expires_at.timestamp(), str(poll.id)]
+        standin.load([documents, by_created, by_expires])
+
+
+def print_results(
+    results: list[ScenarioResult], baseline: dict[str, ScenarioResult], threshold: float
+) -> list[str]:
+    """Print the results table and return the names of regressed scenarios"""
+    regressions = []
+    print(
+        f"{'scenario':<28} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>9} "
+        f"{'trips/req':>9} {'cmds/req':>9}"
+    )
+    for result in results:
+        print(
+            f"{result.name:<28} {result.p50_ms:>8.2f} {result.p99_ms:>8.2f} "
+            f"{result.throughput:>9,.0f} {result.round_trips_per_request:>9.2f} "
+            f"{result.commands_per_request:>9.2f}"
+        )
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+
+        def change(now: float, then: float) -> float:
+            return (now - then) / then if then else 0.0
+
+        p99 = change(result.p99_ms, before.p99_ms)
+        throughput = change(result.throughput, before.throughput)
+        commands = result.commands_per_request - before.commands_per_request
+        regressed = p99 > threshold or throughput < -threshold or commands > 1e-9
+        print(
+            f"{'  vs baseline':<28} {change(result.p50_ms, before.p50_ms):>+8.0%} "
+            f"{p99:>+8.0%} {throughput:>+9.0%} "
+            f"{result.round_trips_per_request - before.round_trips_per_request:>+9.2f} "
+            f"{commands:>+9.2f}{'  REGRESSION' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(result.name)
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    os.environ["UPSTASH_REDIS_URL"] = URL
+    os.environ["UPSTASH_REDIS_TOKEN"] = TOKEN
+
+    from app.services import utils
+    from main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    standin = RedisStandIn(latency=args.latency, redis_url=args.redis_url)
+    standin.flush()
+    standin.attach(utils.get_redis())
+
+    results: list[ScenarioResult] = []
+    n, concurrency = args.requests, args.concurrency
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        def get(path: str) -> Callable[[int], Awaitable[httpx.Response]]:
+            return lambda _: c.get(path)
+
+        def new_poll(i: int) -> Awaitable[httpx.Response]:
+            return c.post(
+                "/polls/create",
+                json={"title": f"bench poll {i}", "options": ["a", "b", "c"]}
+                | {"expires_at": None},
+            )
+
+        results.append(
+            await run_scenario("create_poll", standin, n, concurrency, new_poll)
+        )
+
+        created = (await new_poll(-1)).json()
+        poll_id, options = created["poll_id"], created["poll"]["options"]
+
+        def by_id(i: int) -> Awaitable[httpx.Response]:
+            return c.post(
+                f"/vote/{poll_id}/id",
+                json={"choice_id": options[i % 3]["id"]}
+                | {"voter": {"email": f"id{i}@example.com"}},
+            )
+
+        def by_label(i: int) -> Awaitable[httpx.Response]:
+            return c.post(
+                f"/vote/{poll_id}/label",
+                json={"choice_label": i % 3 + 1}
+                | {"voter": {"email": f"label{i}@example.com"}},
+            )
+
+        results.append(await run_scenario("vote_by_id", standin, n, concurrency, by_id))
+        results.append(
+            await run_scenario("vote_by_label", standin, n, concurrency, by_label)
+        )
+        results.append(
+            await run_scenario(
+                "get_poll_results (hot)",
+                standin,
+                n,
+                concurrency,
+                get(f"/polls/{poll_id}/results"),
+            )
+        )
+        results.append(
+            await run_scenario(
+                "get_poll (hot)",
+                standin,
+                n,
+                concurrency,
+                get(f"/polls/{poll_id}"),
+            )
+        )
+
+        standin.flush()
+        seeded = 0
+        for size in sorted(args.polls):
+            started = time.perf_counter()
+            seed_polls(standin, size - seeded)
+            seeded = size
+            print(f"seeded {size:,} polls in {time.perf_counter() - started:.1f}s")
+            for status in ("all", "active"):
+                results.append(
+                    await run_scenario(
+                        f"get_polls[{status}] @{size:,}",
+                        standin,
+                        n,
+                        concurrency,
+                        get(f"/polls/?status={status}&limit=50"),
+                    )
+                )
+
+    baseline = {}
+    if args.baseline:
+        saved = json.loads(Path(args.baseline).read_text())
+        baseline = {r["name"]: ScenarioResult.model_validate(r) for r in saved}
+    print(f"\n{n} requests per scenario, concurrency {concurrency}")
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps([r.model_dump() for r in results], indent=2) + "\n"
+        )
+        print(f"saved to {args.save}")
+    if regressions:
+        print(f"regressed: {', '.join(regressions)}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--polls",
+        type=lambda v: [int(size) for size in v.split(",")],
+        default=[1000, 100_000],
+        help="comma separated store sizes for get_polls",
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--redis-url", help="real Redis behind the stand-in")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a saved JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative p99/throughput change counted as a regression",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,6 +15,110 @@ class Settings(BaseSettings):
     # Map tới biến môi trường: UPSTASH_REDIS_TOKEN
     UPSTASH_REDIS_TOKEN: str | None = Field(default=None)
 
+    # Driver lưu trữ: "rest" (Upstash REST API qua HTTP) hoặc "resp" (giao thức
+    # Redis gốc, cho Redis tự host tại REDIS_URL)
+    # Map tới biến môi trường: REDIS_DRIVER
+    REDIS_DRIVER: Literal["rest", "resp"] = Field(default="rest")
+    # Ví dụ: redis://:password@localhost:6379/0
+    # Map tới biến môi trường: REDIS_URL
+    REDIS_URL: str | None = Field(default=None)
+    # Số kết nối tối đa (và số kết nối keep-alive với driver rest)
+    # Map tới biến môi trường: REDIS_POOL_SIZE
+    REDIS_POOL_SIZE: int = Field(default=100, gt=0)
+    # Thời gian chờ tối đa khi mọi kết nối trong pool đều đang bận
+    # Map tới biến môi trường: REDIS_POOL_TIMEOUT_SECONDS
+    REDIS_POOL_TIMEOUT_SECONDS: float = Field(default=5.0, gt=0)
+    # Kết nối HTTP rảnh được giữ lại bao lâu (driver rest)
+    # Map tới biến môi trường: REDIS_KEEPALIVE_SECONDS
+    REDIS_KEEPALIVE_SECONDS: float = Field(default=60.0, gt=0)
+
+    # Cache Poll đã parse trong process (poll gần như bất biến sau khi tạo)
+    # Map tới biến môi trường: POLL_CACHE_ENABLED
+    POLL_CACHE_ENABLED: bool = Field(default=True)
+    # Map tới biến môi trường: POLL_CACHE_MAX_SIZE
+    POLL_CACHE_MAX_SIZE: int = Field(default=1024, gt=0)
+    # Map tới biến môi trường: POLL_CACHE_TTL_SECONDS
+    POLL_CACHE_TTL_SECONDS: float = Field(default=60.0, gt=0)
+
+    # Hàng đợi phiếu bầu: endpoint chỉ ghi vào Redis Stream và trả về 202,
+    # worker (python -m app.commands.vote_worker) ghi phiếu theo lô
+    # Map tới biến môi trường: VOTE_QUEUE_ENABLED
+    VOTE_QUEUE_ENABLED: bool = Field(default=False)
+    # Map tới biến môi trường: VOTE_QUEUE_STREAM
+    VOTE_QUEUE_STREAM: str = Field(default="votes:queue")
+    # Map tới biến môi trường: VOTE_QUEUE_GROUP
+    VOTE_QUEUE_GROUP: str = Field(default="vote-workers")
+    # Map tới biến môi trường: VOTE_QUEUE_BATCH_SIZE
+    VOTE_QUEUE_BATCH_SIZE: int = Field(default=500, gt=0)
+    # Phiếu chưa được ack sau khoảng này sẽ bị worker khác nhận lại để thử lại
+    # Map tới biến môi trường: VOTE_QUEUE_RETRY_IDLE_MS
+    VOTE_QUEUE_RETRY_IDLE_MS: int = Field(default=30_000, gt=0)
+    # Số lần giao tối đa trước khi phiếu bị chuyển sang stream dead-letter
+    # Map tới biến môi trường: VOTE_QUEUE_MAX_DELIVERIES
+    VOTE_QUEUE_MAX_DELIVERIES: int = Field(default=5, gt=0)
+    # Map tới biến môi trường: VOTE_QUEUE_POLL_INTERVAL_SECONDS
+    VOTE_QUEUE_POLL_INTERVAL_SECONDS: float = Field(default=0.5, gt=0)
+
+    # Kết quả trực tiếp qua SSE: mỗi process chỉ đọc kết quả của một poll
+    # một lần mỗi nhịp, dù có bao nhiêu người đang theo dõi
+    # Map tới biến môi trường: RESULTS_STREAM_INTERVAL_SECONDS
+    RESULTS_STREAM_INTERVAL_SECONDS: float = Field(default=1.0, gt=0)
+    # Map tới biến môi trường: RESULTS_STREAM_HEARTBEAT_SECONDS
+    RESULTS_STREAM_HEARTBEAT_SECONDS: float = Field(default=15.0, gt=0)
+
+    # Bloom filter email người đã bầu theo poll, để bỏ qua truy vấn Redis khi
+    # chắc chắn là người bầu mới. Bộ nhớ mỗi poll ~ -CAPACITY*ln(ERROR_RATE)/ln(2)^2 bit
+    # (100_000 người, 1% -> ~117 KB)
+    # Map tới biến môi trường: VOTER_FILTER_ENABLED
+    VOTER_FILTER_ENABLED: bool = Field(default=False)
+    # Map tới biến môi trường: VOTER_FILTER_CAPACITY
+    VOTER_FILTER_CAPACITY: int = Field(default=100_000, gt=0)
+    # Map tới biến môi trường: VOTER_FILTER_ERROR_RATE
+    VOTER_FILTER_ERROR_RATE: float = Field(default=0.01, gt=0, lt=1)
+    # Map tới biến môi trường: VOTER_FILTER_MAX_POLLS
+    VOTER_FILTER_MAX_POLLS: int = Field(default=64, gt=0)
+    # Map tới biến môi trường: VOTER_FILTER_TTL_SECONDS
+    VOTER_FILTER_TTL_SECONDS: float = Field(default=3600.0, gt=0)
+
+    # Định dạng lưu phiếu trong votes:{poll_id}: "json" (Vote đầy đủ) hoặc
+    # "compact" ("<label>:<epoch>", ~12 byte thay vì ~190 byte).
+    # Dữ liệu cũ chuyển bằng: python -m app.commands.migrate_vote_encoding
+    # Map tới biến môi trường: VOTE_ENCODING
+    VOTE_ENCODING: Literal["json", "compact"] = Field(default="json")
+
+    # Xoá poll: hash phiếu bầu lớn hơn ngưỡng này được xoá dần ở nền theo lô
+    # (HSCAN + HDEL) thay vì một lệnh DEL chặn Redis
+    # Map tới biến môi trường: POLL_DELETE_BATCH_SIZE
+    POLL_DELETE_BATCH_SIZE: int = Field(default=1000, gt=0)
+
+    # Lưu trữ lạnh poll đã hết hạn: kết quả cuối cùng và phiếu bầu (NDJSON
+    # nén gzip) được ghi ra thư mục này rồi xoá khỏi Redis
+    # (python -m app.commands.archive_expired_polls). None: tắt
+    # Map tới biến môi trường: POLL_ARCHIVE_DIR
+    POLL_ARCHIVE_DIR: str | None = Field(default=None)
+    # Chờ thêm sau expires_at để phiếu còn trong hàng đợi kịp được ghi
+    # Map tới biến môi trường: POLL_ARCHIVE_GRACE_SECONDS
+    POLL_ARCHIVE_GRACE_SECONDS: float = Field(default=3600.0, ge=0)
+
+    # Biểu đồ phiếu theo thời gian: mỗi phiếu tăng bộ đếm theo phút và theo
+    # giờ của lựa chọn (GET /polls/{poll_id}/timeline). Bộ đếm phút giữ ngắn,
+    # bộ đếm giờ (đã gộp) giữ lâu hơn, để bộ nhớ có giới hạn
+    # Map tới biến môi trường: TIMELINE_ENABLED
+    TIMELINE_ENABLED: bool = Field(default=True)
+    # Map tới biến môi trường: TIMELINE_MINUTE_RETENTION_SECONDS
+    TIMELINE_MINUTE_RETENTION_SECONDS: int = Field(default=2 * 86_400, gt=0)
+    # Map tới biến môi trường: TIMELINE_HOUR_RETENTION_SECONDS
+    TIMELINE_HOUR_RETENTION_SECONDS: int = Field(default=90 * 86_400, gt=0)
+
+    # Poll đã đóng hẳn không còn thay đổi: GET poll và kết quả được trả với
+    # Cache-Control immutable, CDN và trình duyệt giữ trong khoảng này
+    # Map tới biến môi trường: CLOSED_POLL_MAX_AGE_SECONDS
+    CLOSED_POLL_MAX_AGE_SECONDS: int = Field(default=31_536_000, gt=0)
+
+    # Metrics Prometheus trên GET /metrics: độ trễ theo route và theo lệnh Redis
+    # Map tới biến môi trường: METRICS_ENABLED
+    METRICS_ENABLED: bool = Field(default=True)
+
     # Cấu hình để đọc từ tệp .env ở thư mục gốc của dự án
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -3,15 +3,19 @@ from typing import cast
 
 from fastapi import FastAPI, Request, Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from app.api import danger, polls, votes
+from app.api import admin, danger, polls, votes
 from app.exceptions.custom_all import (
     BaseCustomException,
     custom_exception_handler,
     generic_exception_handler,
     validation_exception_handler_custom,
 )
+from app.services import metrics
+from app.services.loader import RedisLoaderMiddleware
+from app.services.utils import settings
 
 app = FastAPI(
     title="Polls API",
@@ -30,6 +34,10 @@ app = FastAPI(
             "name": "votes",
             "description": "Operations related to casting votes",
         },
+        {
+            "name": "admin",
+            "description": "Operational endpoints: caches, queues and maintenance",
+        },
     ],
 )
 
@@ -60,6 +68,19 @@ app.add_exception_handler(
 app.include_router(polls.router, prefix="/polls", tags=["polls"])
 app.include_router(danger.router, prefix="/polls", tags=["danger"])
 app.include_router(votes.router, prefix="/vote", tags=["votes"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+
+# Reads within one request are batched and deduplicated (app/services/loader.py)
+app.add_middleware(RedisLoaderMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4"
+        )
 
 
 class Message(BaseModel):
@@ -72,5 +93,5 @@ class Message(BaseModel):
     summary="summary hello world",
     description="mô tả hàm",
 )
-def read_root() -> Message:
+async def read_root() -> Message:
     return Message(message="Hello, World! deploy now")
@@ -0,0 +1,58 @@
+"""
+Every test taking the `driver` fixture runs once per storage driver, each on
+a fresh in-memory Redis:
+
+- rest: RestDriver, answered by the Upstash REST stand-in of the benchmarks
+  (benchmarks/standin.py) through its real HTTP serialization;
+- resp: RespDriver on fakeredis' asyncio client.
+
+The fixture is installed as utils' storage driver, with empty poll caches,
+so the services under test run unchanged on top of it.
+"""
+
+from collections.abc import AsyncIterator
+
+import fakeredis
+import pytest
+
+from app.services import utils
+from app.services.cache import TTLCache
+from app.services.drivers import RestDriver, StorageDriver
+from app.services.resp_driver import RespDriver
+from benchmarks.standin import TOKEN, URL, RedisStandIn
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(params=["rest", "resp"])
+async def driver(
+    request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch
+) -> AsyncIterator[StorageDriver]:
+    client: StorageDriver
+    if request.param == "rest":
+        client = RestDriver(
+            URL,
+            TOKEN,
+            pool_size=10,
+            pool_timeout=5.0,
+            keepalive=5.0,
+            instrumented=False,
+        )
+        RedisStandIn().attach(client)
+    else:
+        client = RespDriver(
+            fakeredis.FakeAsyncRedis(
+                server=fakeredis.FakeServer(), decode_responses=True, protocol=2
+            ),
+            instrumented=False,
+        )
+
+    monkeypatch.setattr(utils, "_redis_client", client)
+    monkeypatch.setattr(utils, "poll_cache", TTLCache(64, 60.0))
+    monkeypatch.setattr(utils, "poll_json_cache", TTLCache(64, 60.0))
+    monkeypatch.setattr(utils, "poll_archive", None)
+    yield client
+    await client.close()
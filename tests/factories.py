@@ -0,0 +1,27 @@
+"""Polls and votes as the API builds them"""
+
+from datetime import UTC, datetime, timedelta
+
+from app.models.Polls import Poll, PollCreate
+from app.models.Votes import Vote, Voter
+
+
+def new_poll(
+    title: str = "Test poll",
+    options: tuple[str, ...] = ("a", "b", "c"),
+    expires_in: timedelta | None = None,
+) -> Poll:
+    """A poll as POST /polls/create makes it, expiring in expires_in (which
+    may be negative: create_poll itself refuses past expiries)"""
+    poll = PollCreate(title=title, options=list(options), expires_at=None).create_poll()
+    if expires_in is not None:
+        poll = poll.model_copy(update={"expires_at": datetime.now(UTC) + expires_in})
+    return poll
+
+
+def new_vote(poll: Poll, option: int, email: str) -> Vote:
+    return Vote(
+        poll_id=poll.id,
+        choice_id=poll.options[option].id,
+        voter=Voter(email=email),
+    )
@@ -0,0 +1,97 @@
+import pytest
+
+from app.models.Results import PollResults, Result
+from app.services import utils
+from app.services.drivers import StorageDriver
+from app.services.utils import VoteStatus
+from tests.factories import new_poll, new_vote
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("encoding", ["json", "compact"])
+async def test_a_voter_is_counted_once(
+    driver: StorageDriver, monkeypatch: pytest.MonkeyPatch, encoding: str
+) -> None:
+    monkeypatch.setattr(utils.settings, "VOTE_ENCODING", encoding)
+    poll = new_poll()
+    await utils.save_poll(poll)
+
+    first = new_vote(poll, 0, "voter@example.com")
+    assert await utils.save_vote(poll, first) == VoteStatus.RECORDED
+    again = new_vote(poll, 1, "voter@example.com")
+    assert await utils.save_vote(poll, again) == VoteStatus.ALREADY_VOTED
+
+    assert await utils.get_vote_count(poll.id) == {poll.options[0].id: 1}
+    stored = await utils.get_vote(poll.id, "voter@example.com")
+    assert stored is not None
+    assert stored.choice_id == poll.options[0].id
+    assert await driver.hlen(f"votes:{poll.id}") == 1
+
+
+async def test_bulk_statuses_follow_the_votes(driver: StorageDriver) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    await utils.save_vote(poll, new_vote(poll, 0, "early@example.com"))
+
+    statuses = await utils.save_votes(
+        poll,
+        [
+            new_vote(poll, 1, "new@example.com"),
+            new_vote(poll, 2, "early@example.com"),
+            new_vote(poll, 2, "other@example.com"),
+        ],
+    )
+
+    assert statuses == [
+        VoteStatus.RECORDED,
+        VoteStatus.ALREADY_VOTED,
+        VoteStatus.RECORDED,
+    ]
+    assert await driver.hlen(f"votes:{poll.id}") == 3
+
+
+async def test_results_document_is_what_pydantic_renders(
+    driver: StorageDriver,
+) -> None:
+    # Escaping and non-ASCII text must come out of the script unchanged
+    poll = new_poll(
+        title='Bữa trưa "ăn" gì? 🍜',
+        options=("Phở", 'Bún "chả"', "Cơm tấm\\"),
+    )
+    await utils.save_poll(poll)
+    for i, option in enumerate([2, 0, 2, 1]):
+        await utils.save_vote(poll, new_vote(poll, option, f"v{i}@example.com"))
+
+    expected = PollResults(
+        id=poll.id,
+        title=poll.title,
+        total_votes=4,
+        # Ties stay in option order
+        results=[
+            Result(description="Cơm tấm\\", vote_count=2),
+            Result(description="Phở", vote_count=1),
+            Result(description='Bún "chả"', vote_count=1),
+        ],
+    )
+    assert await driver.get(f"poll_results:{poll.id}") == expected.model_dump_json()
+    assert await utils.get_poll_results_json(poll.id) == expected.model_dump_json()
+
+
+async def test_a_deleted_poll_gets_no_votes(driver: StorageDriver) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    await utils.save_vote(poll, new_vote(poll, 0, "before@example.com"))
+    await utils.delete_poll(poll.id)
+
+    # As if another process still had the poll in its cache
+    late = new_vote(poll, 0, "after@example.com")
+    assert await utils.save_vote(poll, late) == VoteStatus.POLL_NOT_FOUND
+    assert await utils.save_votes(poll, [late]) == [VoteStatus.POLL_NOT_FOUND]
+
+    assert (
+        await driver.exists(
+            f"votes:{poll.id}", f"votes_count:{poll.id}", f"poll_results:{poll.id}"
+        )
+        == 0
+    )
@@ -0,0 +1,185 @@
+"""
+Conditional GETs and Cache-Control of GET /polls/{poll_id} and
+GET /polls/{poll_id}/results, through the polls router
+"""
+
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import polls
+from app.models.Polls import Poll
+from app.services import poll_lifecycle, utils
+from app.services.poll_archive import PollArchive
+from app.services.poll_codec import decode_poll, encode_poll
+from app.services.poll_lifecycle import ArchiveStatus
+from tests.factories import new_poll, new_vote
+
+# Every test runs over both storage drivers
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("driver")]
+
+MAX_AGE = 600
+IMMUTABLE = f"public, max-age={MAX_AGE}, immutable"
+
+
+@pytest.fixture
+async def client(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[httpx.AsyncClient]:
+    monkeypatch.setattr(utils.settings, "CLOSED_POLL_MAX_AGE_SECONDS", MAX_AGE)
+    monkeypatch.setattr(utils.settings, "VOTE_QUEUE_ENABLED", False)
+    app = FastAPI()
+    app.include_router(polls.router, prefix="/polls")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+def http_date(instant: datetime | None) -> str:
+    assert instant is not None
+    return format_datetime(instant, usegmt=True)
+
+
+async def save_poll(expires_in: timedelta | None = None) -> Poll:
+    """The poll with one vote, as read back from Redis"""
+    poll = new_poll(expires_in=expires_in)
+    await utils.save_poll(poll)
+    await utils.save_vote(poll, new_vote(poll, 0, "v@example.com"))
+    return decode_poll(encode_poll(poll))
+
+
+async def test_open_poll_is_revalidated(client: httpx.AsyncClient) -> None:
+    poll = await save_poll(expires_in=timedelta(days=1))
+
+    response = await client.get(f"/polls/{poll.id}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["last-modified"] == http_date(poll.created_at)
+    etag = response.headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        again = await client.get(
+            f"/polls/{poll.id}", headers={"If-None-Match": if_none_match}
+        )
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+        assert again.headers["cache-control"] == "no-cache"
+
+    other = await client.get(f"/polls/{poll.id}", headers={"If-None-Match": '"x"'})
+    assert other.status_code == 200
+    assert other.content == response.content
+
+    # If-None-Match wins over a matching If-Modified-Since
+    both = await client.get(
+        f"/polls/{poll.id}",
+        headers={
+            "If-None-Match": '"x"',
+            "If-Modified-Since": http_date(poll.created_at),
+        },
+    )
+    assert both.status_code == 200
+    since = await client.get(
+        f"/polls/{poll.id}",
+        headers={"If-Modified-Since": http_date(poll.created_at)},
+    )
+    assert since.status_code == 304
+
+
+async def test_open_poll_results_change_etag_with_each_vote(
+    client: httpx.AsyncClient,
+) -> None:
+    poll = await save_poll(expires_in=timedelta(days=1))
+
+    response = await client.get(f"/polls/{poll.id}/results")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    # Results of an open poll have no Last-Modified to go by
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+    assert (
+        await client.get(f"/polls/{poll.id}/results", headers={"If-None-Match": etag})
+    ).status_code == 304
+
+    await utils.save_vote(poll, new_vote(poll, 1, "other@example.com"))
+    after_vote = await client.get(
+        f"/polls/{poll.id}/results", headers={"If-None-Match": etag}
+    )
+    assert after_vote.status_code == 200
+    assert after_vote.headers["etag"] != etag
+    assert after_vote.json()["total_votes"] == 2
+
+
+async def test_expired_poll_is_immutable(client: httpx.AsyncClient) -> None:
+    poll = await save_poll(expires_in=timedelta(hours=-1))
+    assert poll.expires_at is not None
+
+    for path in (f"/polls/{poll.id}", f"/polls/{poll.id}/results"):
+        response = await client.get(path)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == IMMUTABLE
+
+    results = await client.get(f"/polls/{poll.id}/results")
+    assert results.headers["last-modified"] == http_date(poll.expires_at)
+    since = await client.get(
+        f"/polls/{poll.id}/results",
+        headers={"If-Modified-Since": http_date(poll.expires_at)},
+    )
+    assert since.status_code == 304
+    assert since.headers["cache-control"] == IMMUTABLE
+    before = await client.get(
+        f"/polls/{poll.id}/results",
+        headers={"If-Modified-Since": http_date(poll.expires_at - timedelta(hours=1))},
+    )
+    assert before.status_code == 200
+
+
+async def test_expired_poll_waits_for_the_vote_queue(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(utils.settings, "VOTE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(utils.settings, "POLL_ARCHIVE_GRACE_SECONDS", 3600.0)
+    # Queued votes may still land
+    recent = await save_poll(expires_in=timedelta(minutes=-10))
+    response = await client.get(f"/polls/{recent.id}/results")
+    assert response.headers["cache-control"] == "no-cache"
+    assert "last-modified" not in response.headers
+
+    final = await save_poll(expires_in=timedelta(hours=-2))
+    response = await client.get(f"/polls/{final.id}/results")
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert final.expires_at is not None
+    assert response.headers["last-modified"] == http_date(
+        final.expires_at + timedelta(hours=1)
+    )
+
+
+async def test_archived_poll_keeps_its_validators(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    archive = PollArchive(tmp_path, 16)
+    monkeypatch.setattr(utils, "poll_archive", archive)
+    poll = await save_poll(expires_in=timedelta(hours=-1))
+    paths = (f"/polls/{poll.id}", f"/polls/{poll.id}/results")
+    before = [await client.get(path) for path in paths]
+
+    assert await poll_lifecycle.archive_poll(archive, poll.id) == (
+        ArchiveStatus.ARCHIVED,
+        1,
+    )
+    utils.forget_poll(poll.id)
+
+    for path, earlier in zip(paths, before, strict=True):
+        response = await client.get(path)
+        assert response.status_code == 200
+        assert response.content == earlier.content
+        for header in ("etag", "last-modified", "cache-control"):
+            assert response.headers[header] == earlier.headers[header]
+        assert response.headers["cache-control"] == IMMUTABLE
+        revalidated = await client.get(
+            path, headers={"If-None-Match": earlier.headers["etag"]}
+        )
+        assert revalidated.status_code == 304
@@ -0,0 +1,121 @@
+import math
+from base64 import urlsafe_b64encode
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.polls import PollsCursor, PollStatus
+from app.models.Polls import Poll
+from app.services import utils
+from app.services.drivers import StorageDriver
+from app.services.poll_codec import decode_poll, encode_poll
+from tests.factories import new_poll
+
+pytestmark = pytest.mark.anyio
+
+Page = Callable[
+    [int, utils.PageCursor | None],
+    Awaitable[tuple[list[Poll], utils.PageCursor | None]],
+]
+
+
+async def walk(get_page: Page, limit: int) -> list[Poll]:
+    """Every poll of a listing, a page at a time, through client cursors"""
+    polls: list[Poll] = []
+    after = None
+    while True:
+        page, next_page = await get_page(limit, after)
+        polls += page
+        if next_page is None:
+            return polls
+        # As handed to the client and sent back
+        cursor = PollsCursor(**next_page.model_dump(), status=PollStatus.ALL)
+        after = PollsCursor.decode(cursor.encode(), PollStatus.ALL)
+
+
+def stored(poll: Poll) -> Poll:
+    """The poll as read back from Redis"""
+    return decode_poll(encode_poll(poll))
+
+
+async def save_polls() -> dict[str, list[Poll]]:
+    open_polls = [new_poll(expires_in=timedelta(hours=h)) for h in (1, 2, 2, 2, 3)]
+    # The same expiry: one tie group in polls:expires
+    for poll in open_polls[2:4]:
+        poll.expires_at = open_polls[1].expires_at
+    forever = [new_poll() for _ in range(4)]
+    # Their scores keep ~0.1 ms of created_at: space them out
+    for i, poll in enumerate(forever):
+        poll.created_at += timedelta(seconds=i)
+    closed = [new_poll(expires_in=timedelta(hours=-h)) for h in (3, 2, 1)]
+    for poll in [*open_polls, *forever, *closed]:
+        await utils.save_poll(poll)
+    return {"open": open_polls, "forever": forever, "closed": closed}
+
+
+@pytest.mark.usefixtures("driver")
+@pytest.mark.parametrize("limit", [1, 2, 3, 50])
+async def test_listings_return_every_poll_once(limit: int) -> None:
+    saved = await save_polls()
+
+    active = await walk(utils.get_active_polls, limit)
+    assert len(active) == len({p.id for p in active}) == 9
+    # Closing soonest first, polls without an expiry last in creation order
+    expiries = [p.expires_at for p in active[:5]]
+    assert expiries == sorted(stored(p).expires_at for p in saved["open"])  # type: ignore[type-var]
+    assert [p.id for p in active[5:]] == [p.id for p in saved["forever"]]
+
+    expired = await walk(utils.get_expired_polls, limit)
+    assert [p.id for p in expired] == [p.id for p in saved["closed"]]
+
+    everything = await walk(utils.get_all_polls, limit)
+    assert {p.id for p in everything} == {
+        p.id for polls in saved.values() for p in polls
+    }
+    assert len(everything) == 12
+
+
+async def test_polls_without_expiry_have_distinct_scores(
+    driver: StorageDriver,
+) -> None:
+    saved = await save_polls()
+
+    scores: list[float] = []
+    for poll in saved["forever"]:
+        score = await driver.zscore(utils.POLLS_BY_EXPIRES, str(poll.id))
+        assert score is not None
+        scores.append(score)
+    latest_expiry = max(p.expires_at.timestamp() for p in saved["open"])  # type: ignore[union-attr]
+    assert all(math.isfinite(s) and s > latest_expiry for s in scores)
+    assert scores == sorted(set(scores))
+
+
+async def test_pages_across_polls_indexed_at_infinity(
+    driver: StorageDriver,
+) -> None:
+    # Indexed before polls without an expiry got scores of their own
+    legacy = [new_poll() for _ in range(3)]
+    for poll in legacy:
+        await utils.save_poll(poll)
+        await driver.execute(["ZADD", utils.POLLS_BY_EXPIRES, "+inf", str(poll.id)])
+
+    active = await walk(utils.get_active_polls, 1)
+    assert sorted(str(p.id) for p in active) == sorted(str(p.id) for p in legacy)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        '{"score":"abc","skip":0,"status":"all"}',
+        '{"score":1.5,"skip":-5,"status":"all"}',
+        '{"score":1.5,"status":"all"}',
+        "not base64 json",
+    ],
+)
+def test_malformed_cursors_are_rejected(cursor: str) -> None:
+    encoded = urlsafe_b64encode(cursor.encode()).decode()
+    with pytest.raises(HTTPException) as error:
+        PollsCursor.decode(encoded, PollStatus.ALL)
+    assert error.value.status_code == 400
@@ -0,0 +1,91 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+
+from app.services import loader, utils
+from app.services.drivers import StorageDriver
+from tests.factories import new_poll, new_vote
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def request_loader() -> AsyncIterator[loader.RedisLoader]:
+    """The loader RedisLoaderMiddleware gives a request"""
+    request_loader = loader.RedisLoader()
+    token = loader.current_loader.set(request_loader)
+    yield request_loader
+    loader.current_loader.reset(token)
+
+
+@pytest.fixture
+def sent(driver: StorageDriver, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """What reaches the driver: "execute" per command, "pipeline" per batch"""
+    calls: list[str] = []
+    execute, pipeline = driver.execute, driver.pipeline
+
+    async def counted_execute(command: list[Any]) -> Any:
+        calls.append("execute")
+        return await execute(command)
+
+    def counted_pipeline() -> Any:
+        calls.append("pipeline")
+        return pipeline()
+
+    monkeypatch.setattr(driver, "execute", counted_execute)
+    monkeypatch.setattr(driver, "pipeline", counted_pipeline)
+    return calls
+
+
+@pytest.mark.usefixtures("request_loader")
+async def test_gathered_reads_go_out_as_one_pipeline(
+    driver: StorageDriver, sent: list[str]
+) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    utils.forget_poll(poll.id)
+    await utils.save_vote(poll, new_vote(poll, 1, "voter@example.com"))
+    sent.clear()
+
+    loaded_poll, same_poll, voted, counts, results = await asyncio.gather(
+        utils.get_poll(poll.id),
+        utils.get_poll(poll.id),
+        utils.has_voted(poll.id, "voter@example.com"),
+        utils.get_vote_count(poll.id),
+        utils.get_poll_results_json(poll.id),
+    )
+
+    # Four distinct reads, the repeated GET sent once
+    assert sent == ["pipeline"]
+    assert loaded_poll is not None
+    assert loaded_poll == same_poll
+    assert voted is True
+    assert counts == {poll.options[1].id: 1}
+    assert results == await driver.get(f"poll_results:{poll.id}")
+
+
+@pytest.mark.usefixtures("request_loader")
+async def test_a_repeated_read_sees_the_first_answer(
+    driver: StorageDriver, sent: list[str]
+) -> None:
+    assert await loader.read(driver, ["GET", "key"]) is None
+    await driver.set("key", "value")
+    sent.clear()
+    assert await loader.read(driver, ["GET", "key"]) is None
+    assert sent == []
+
+    # Outside a request, reads go straight to the driver
+    loader.current_loader.set(None)
+    assert await loader.read(driver, ["GET", "key"]) == "value"
+
+
+@pytest.mark.usefixtures("request_loader")
+async def test_a_failed_read_is_retried(driver: StorageDriver) -> None:
+    await driver.set("key", "not a hash")
+    with pytest.raises(Exception, match="WRONGTYPE"):
+        await loader.read(driver, ["HGETALL", "key"])
+
+    await driver.delete("key")
+    assert await loader.read(driver, ["HGETALL", "key"]) == {}
@@ -0,0 +1,166 @@
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.services import poll_deletion, poll_lifecycle, utils
+from app.services.drivers import StorageDriver
+from app.services.poll_archive import PollArchive
+from app.services.poll_codec import decode_poll, encode_poll
+from app.services.poll_lifecycle import ArchiveStatus
+from app.services.scripts import EVICT_ARCHIVED_POLL
+from app.services.timeline import VoteTimeline
+from tests.factories import new_poll, new_vote
+
+pytestmark = pytest.mark.anyio
+
+
+def hot_keys(poll_id: object) -> list[str]:
+    return [
+        f"poll:{poll_id}",
+        f"votes:{poll_id}",
+        f"votes_count:{poll_id}",
+        f"poll_results:{poll_id}",
+    ]
+
+
+async def test_delete_small_poll_inline(driver: StorageDriver) -> None:
+    poll = new_poll(expires_in=timedelta(days=1))
+    await utils.save_poll(poll)
+    for i in range(3):
+        await utils.save_vote(poll, new_vote(poll, i, f"v{i}@example.com"))
+
+    assert len(await driver.keys(f"timeline:{poll.id}:*")) == 2
+
+    assert await utils.delete_poll(poll.id) == 0
+
+    assert await driver.exists(*hot_keys(poll.id)) == 0
+    assert await driver.keys(f"timeline:{poll.id}:*") == []
+    for index in (
+        utils.POLLS_BY_CREATED,
+        utils.POLLS_BY_EXPIRES,
+        utils.POLLS_TO_ARCHIVE,
+    ):
+        assert await driver.zscore(index, str(poll.id)) is None
+    assert await utils.get_poll(poll.id) is None
+    assert await driver.zcard(utils.POLLS_DELETING) == 0
+
+
+async def test_delete_large_poll_in_batches(
+    driver: StorageDriver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(utils.settings, "POLL_DELETE_BATCH_SIZE", 2)
+    poll = new_poll()
+    await utils.save_poll(poll)
+    votes = [new_vote(poll, i % 3, f"v{i}@example.com") for i in range(5)]
+    await utils.save_votes(poll, votes)
+
+    assert await utils.delete_poll(poll.id) == 5
+
+    # Gone from every read at once, its votes kept aside for the cleanup
+    assert await driver.exists(*hot_keys(poll.id)) == 0
+    assert await driver.hlen(utils.deleted_votes_key(poll.id)) == 5
+    assert await driver.zscore(utils.POLLS_DELETING, str(poll.id)) is not None
+
+    assert await poll_deletion.purge_votes(poll.id) >= 3
+    assert (
+        await driver.exists(
+            utils.deleted_votes_key(poll.id), utils.deletion_progress_key(poll.id)
+        )
+        == 0
+    )
+    assert await driver.zcard(utils.POLLS_DELETING) == 0
+
+
+async def test_archive_moves_poll_out_of_redis(
+    driver: StorageDriver, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    archive = PollArchive(tmp_path, 16)
+    monkeypatch.setattr(utils, "poll_archive", archive)
+    poll = new_poll(expires_in=timedelta(days=1))
+    await utils.save_poll(poll)
+    for i in range(4):
+        await utils.save_vote(poll, new_vote(poll, i % 2, f"v{i}@example.com"))
+    results_json = await utils.get_poll_results_json(poll.id)
+
+    assert await poll_lifecycle.archive_poll(archive, poll.id) == (
+        ArchiveStatus.ARCHIVED,
+        4,
+    )
+
+    assert await driver.exists(*hot_keys(poll.id)) == 0
+    assert await driver.keys(f"timeline:{poll.id}:*") == []
+    assert await driver.zscore(utils.POLLS_TO_ARCHIVE, str(poll.id)) is None
+    # Still listed, and served from the archive
+    assert await driver.zscore(utils.POLLS_BY_CREATED, str(poll.id)) is not None
+    utils.forget_poll(poll.id)
+    assert await utils.get_poll(poll.id) == decode_poll(encode_poll(poll))
+    assert await utils.get_poll_results_json(poll.id) == results_json
+    assert sorted(v.voter.email for v in archive.read_votes(poll.id)) == [
+        f"v{i}@example.com" for i in range(4)
+    ]
+
+
+async def test_eviction_keeps_a_poll_that_changed(driver: StorageDriver) -> None:
+    poll = new_poll(expires_in=timedelta(days=1))
+    await utils.save_poll(poll)
+    await utils.save_vote(poll, new_vote(poll, 0, "v@example.com"))
+
+    def evict(archived_votes: int) -> list[str]:
+        return [str(poll.id), "0", "1000", str(archived_votes)]
+
+    keys = [
+        f"poll:{poll.id}",
+        f"votes_count:{poll.id}",
+        f"poll_results:{poll.id}",
+        f"votes:{poll.id}",
+        utils.deleted_votes_key(poll.id),
+        utils.POLLS_DELETING,
+        utils.deletion_progress_key(poll.id),
+        utils.POLLS_TO_ARCHIVE,
+    ]
+    # A vote arrived after the archive was written
+    assert await EVICT_ARCHIVED_POLL(driver, keys, evict(0)) == -1
+    assert await driver.exists(*hot_keys(poll.id)) == 4
+
+    await utils.delete_poll(poll.id)
+    assert await EVICT_ARCHIVED_POLL(driver, keys, evict(1)) == -2
+
+
+async def test_results_of_a_poll_deleted_elsewhere_are_not_rebuilt(
+    driver: StorageDriver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    await utils.save_vote(poll, new_vote(poll, 0, "v@example.com"))
+    assert await utils.get_poll(poll.id) is not None
+
+    # Deleted by another process: this one still has the poll cached
+    with monkeypatch.context() as m:
+        m.setattr(utils, "forget_poll", lambda _: None)
+        await utils.delete_poll(poll.id)
+
+    assert await utils.get_many_poll_results_json([poll.id]) == {}
+    assert await utils.get_poll_results_json(poll.id) is None
+    assert await driver.exists(*hot_keys(poll.id)) == 0
+    assert await utils.get_poll(poll.id) is None
+
+
+def test_timeline_keys_cover_the_poll_lifetime_within_retention() -> None:
+    timeline = VoteTimeline(minute_retention=2 * 3600, hour_retention=3 * 86400)
+    poll = new_poll()
+    now = datetime(2026, 10, 18, 12, 30, tzinfo=UTC)
+
+    # Created an hour ago: this hour and the last, today
+    poll.created_at = now - timedelta(hours=1)
+    assert timeline.poll_keys(poll.id, poll.created_at, now) == [
+        timeline.key(poll.id, "minute", int(now.timestamp()) - 5400),
+        timeline.key(poll.id, "minute", int(now.timestamp()) - 1800),
+        timeline.key(poll.id, "hour", int(now.timestamp()) - 45000),
+    ]
+
+    # Created long ago: only the hashes not expired yet
+    poll.created_at = now - timedelta(days=30)
+    keys = timeline.poll_keys(poll.id, poll.created_at, now)
+    assert len([k for k in keys if ":m:" in k]) == 4
+    assert len([k for k in keys if ":h:" in k]) == 5
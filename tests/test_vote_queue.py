@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, cast
+
+import pytest
+
+from app.services import utils, vote_queue
+from app.services.drivers import StorageDriver
+from tests.factories import new_poll, new_vote
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue(
+    driver: StorageDriver, monkeypatch: pytest.MonkeyPatch
+) -> StorageDriver:
+    """The vote queue's consumer group, retrying entries idle for 10 ms"""
+    monkeypatch.setattr(utils.settings, "VOTE_QUEUE_RETRY_IDLE_MS", 10)
+    await vote_queue.ensure_group()
+    return driver
+
+
+async def pending_by_consumer(driver: StorageDriver) -> dict[str, int]:
+    summary = cast(
+        list[Any],
+        await driver.execute(["XPENDING", vote_queue.STREAM, vote_queue.GROUP]),
+    )
+    return {name: int(count) for name, count in summary[3] or []}
+
+
+async def test_an_idle_entry_is_reclaimed_by_another_consumer(
+    queue: StorageDriver,
+) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    entry_id = await vote_queue.enqueue_vote(new_vote(poll, 1, "v@example.com"))
+    # Delivered to a worker that never acknowledges it
+    assert [e for e, _ in await vote_queue.read_new("lost", 10)] == [entry_id]
+
+    assert await vote_queue.claim_stale("worker", 10) == ([], [])
+    await asyncio.sleep(0.05)
+    retry, dead = await vote_queue.claim_stale("worker", 10)
+    assert [e for e, _ in retry] == [entry_id]
+    assert dead == []
+    assert await pending_by_consumer(queue) == {"worker": 1}
+
+    outcome = await vote_queue.apply(retry)
+    assert outcome.recorded == 1
+    assert await utils.get_vote_count(poll.id) == {poll.options[1].id: 1}
+    assert await pending_by_consumer(queue) == {}
+    assert await queue.execute(["XLEN", vote_queue.STREAM]) == 0
+
+
+async def test_an_entry_out_of_attempts_is_dead_lettered(
+    queue: StorageDriver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(utils.settings, "VOTE_QUEUE_MAX_DELIVERIES", 2)
+    poll = new_poll()
+    await utils.save_poll(poll)
+    entry_id = await vote_queue.enqueue_vote(new_vote(poll, 0, "v@example.com"))
+    await vote_queue.read_new("lost", 10)
+
+    # Second delivery: retried, and lost again
+    await asyncio.sleep(0.05)
+    retry, _ = await vote_queue.claim_stale("lost", 10)
+    assert [e for e, _ in retry] == [entry_id]
+
+    await asyncio.sleep(0.05)
+    handled, outcome = await vote_queue.process_batch("worker")
+
+    assert handled == 1
+    assert outcome.dead_lettered == 1
+    assert outcome.recorded == 0
+    assert await pending_by_consumer(queue) == {}
+    assert await queue.execute(["XLEN", vote_queue.STREAM]) == 0
+    [(_, fields)] = await queue.execute(
+        ["XRANGE", vote_queue.DEAD_LETTER_STREAM, "-", "+"]
+    )
+    dead = dict(zip(fields[::2], fields[1::2], strict=True))
+    assert dead["entry_id"] == entry_id
+    assert dead["reason"] == "max_deliveries"
+    assert await utils.get_vote_count(poll.id) == {}
+
+
+@pytest.mark.parametrize("cached", [False, True])
+async def test_a_vote_for_a_deleted_poll_is_dropped(
+    queue: StorageDriver, monkeypatch: pytest.MonkeyPatch, cached: bool
+) -> None:
+    poll = new_poll()
+    await utils.save_poll(poll)
+    await vote_queue.enqueue_vote(new_vote(poll, 0, "v@example.com"))
+    with monkeypatch.context() as m:
+        if cached:
+            # Deleted by another process, this one still has the poll cached
+            assert await utils.get_poll(poll.id) is not None
+            m.setattr(utils, "forget_poll", lambda _: None)
+        await utils.delete_poll(poll.id)
+
+    handled, outcome = await vote_queue.process_batch("worker")
+
+    assert handled == 1
+    assert outcome.dropped == 1
+    assert outcome.recorded == outcome.failed == 0
+    assert await pending_by_consumer(queue) == {}
+    assert (
+        await queue.exists(
+            f"poll:{poll.id}",
+            f"votes:{poll.id}",
+            f"votes_count:{poll.id}",
+            f"poll_results:{poll.id}",
+        )
+        == 0
+    )